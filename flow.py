@@ -1,11 +1,25 @@
+from abc import ABC, abstractmethod
+from collections import namedtuple
 from datetime import datetime, timedelta
 from typing import List, Tuple, Dict, Optional
-from pocketflow import Node, Flow, BatchFlow
+from pocketflow import AsyncNode, AsyncFlow, AsyncParallelBatchFlow
 import yaml
+import asyncio
+try:
+    # libyaml-backed loader is much faster than the pure-Python one
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
 import logging
+import re
 import time
 import email
 import email.utils
+try:
+    # Optional: lets the action decider settle unambiguous emails without the LLM
+    from dateparser.search import search_dates
+except ImportError:
+    search_dates = None
 
 # Configure logging with more detailed format
 logging.basicConfig(
@@ -15,144 +29,257 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-from utils.call_llm import call_llm
-from utils.check_unread_emails import check_unread_emails
-from utils.check_availability import check_availability
+# Seconds to wait for new mail (IMAP IDLE) before re-checking the inbox
+IDLE_TIMEOUT = 300
+# Failed runs of one email before it is given up on
+MAX_EMAIL_ATTEMPTS = 3
+# Seconds before a failed email is retried, doubled after each further failure
+RETRY_BACKOFF = 60
+
+from utils.call_llm import call_llm_async
+from utils.check_unread_emails import check_unread_emails, idle_wait_for_unread, load_bodies, mark_unread
+from utils.check_availability import check_availability, clear_busy_cache
 from utils.schedule_meeting import schedule_meeting
-from utils.send_email import send_email
+from utils.send_email import send_email_async
+from utils.render_template import render_template
+from utils.pending_store import PendingStore, DEFAULT_PATH as DEFAULT_STATE_PATH
+
+def load_yaml(yaml_str: str):
+    """Parse LLM YAML output with the C loader when available."""
+    return yaml.load(yaml_str, Loader=YamlLoader)
+
+_YAML_FENCE_RE = re.compile(r"```yaml(.*?)(?:```|\Z)", re.DOTALL)
+
+def extract_yaml(response: str) -> str:
+    """Return the contents of the first ```yaml fenced block in an LLM response."""
+    m = _YAML_FENCE_RE.search(response)
+    if not m:
+        raise ValueError("LLM response has no ```yaml fenced block")
+    return m.group(1).strip()
+
+_ET_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2}) (\d{1,2}):(\d{2}) ET")
+_SLOT_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2}) (\d{1,2}):(\d{2}) ET to (\d{1,2}):(\d{2}) ET")
+
+# Scheduling phrases, weekdays and dates, and times of day. Emails matching none of
+# them skip the LLM, which still decides whether a match is really about scheduling
+_SCHED_RE = re.compile(r"""\b(?:
+    (?:re)?schedul\w* | meet(?:s|ing|ings)? | avail(?:able|ability) | calendar | appointment
+  | what\s+time | good\s+time | time\s+works | works?\s+for\s+(?:you|me|us|everyone)
+  | hop\s+on | catch\s+up | (?:set\s+up|book|grab|quick)\s+(?:a\s+)?(?:call|sync|chat)
+  | tomorrow | (?:this|next)\s+week | this\s+(?:morning|afternoon|evening)
+  | (?:mon|tues?|wed(?:nes)?|thu(?:rs?)?|fri)(?:day)? | saturday | sunday
+  | (?:jan|feb|mar|apr|may|jun|jul|aug|sept?|oct|nov|dec)[a-z]*\.?\s+\d{1,2}
+  | at\s+\d{1,2} | \d{1,2}(?::\d{2})?\s*[ap]\.?m | \d{1,2}:\d{2}
+)\b""", re.I | re.X)
+
+# An explicit clock time ("2pm", "2:30 p.m.", "14:00"); dateparser fills in the
+# current time of day for phrases like "next week", so only these count as times
+_CLOCK_TIME_RE = re.compile(r"\b\d{1,2}(?::\d{2})?\s*(?:[ap]\.?m\b\.?)|\b\d{1,2}:\d{2}\b", re.I)
+
+def parse_et(value: str) -> datetime:
+    """Parse "YYYY-MM-DD HH:MM ET" with a precompiled regex instead of strptime."""
+    m = _ET_RE.fullmatch(value.strip())
+    if not m:
+        raise ValueError(f"time data {value!r} does not match 'YYYY-MM-DD HH:MM ET'")
+    return datetime(*map(int, m.groups()))
+
+def parse_slot(value: str) -> Tuple[datetime, datetime]:
+    """Parse "YYYY-MM-DD HH:MM ET to HH:MM ET" into a (start, end) tuple."""
+    m = _SLOT_RE.fullmatch(value.strip())
+    if not m:
+        raise ValueError(f"slot {value!r} does not match 'YYYY-MM-DD HH:MM ET to HH:MM ET'")
+    year, month, day, start_hour, start_minute, end_hour, end_minute = map(int, m.groups())
+    return (datetime(year, month, day, start_hour, start_minute),
+            datetime(year, month, day, end_hour, end_minute))
+
+# Date context shared by every email in a batch
+TimeframeContext = namedtuple(
+    "TimeframeContext", ["today", "today_str", "this_week_end_str", "next_monday_str", "next_friday_str"]
+)
 
-class EmailFetcherNode(Node):
+def is_due(msg: Dict, now: float) -> bool:
+    """Whether a pending entry should run now: not given up on and not backing off."""
+    return not msg.get("failed") and msg.get("next_attempt_at", 0) <= now
+
+def build_timeframe_ctx(now: datetime) -> TimeframeContext:
+    """Compute the default timeframes (rest of this week, next Monday-Friday) once."""
+    this_week_end = now + timedelta(days=(6 - now.weekday()))
+    next_monday = now + timedelta(days=(7 - now.weekday()))
+    next_friday = next_monday + timedelta(days=4)
+    return TimeframeContext(
+        today=now,
+        today_str=now.strftime("%Y-%m-%d"),
+        this_week_end_str=this_week_end.strftime("%Y-%m-%d"),
+        next_monday_str=next_monday.strftime("%Y-%m-%d"),
+        next_friday_str=next_friday.strftime("%Y-%m-%d")
+    )
+
+class EmailFetcherNode(AsyncNode):
     """Monitors inbox for new emails from authorized user."""
-    def prep(self, shared):
+    async def prep_async(self, shared):
         logger.debug("Preparing email fetcher with config from shared state")
+        if "pending_emails" not in shared:
+            # Persisted so in-flight emails survive a restart
+            shared["pending_emails"] = PendingStore(shared["config"].get("state_path", DEFAULT_STATE_PATH))
+        now = time.time()
+        failed, retry_at = set(), []
+        for email_id, msg in shared["pending_emails"].items():
+            if msg.get("failed"):
+                failed.add(email_id)
+            else:
+                retry_at.append(msg.get("next_attempt_at", 0))
         return {
             "username": shared["config"]["email"]["username"],
             "password": shared["config"]["email"]["password"],
-            "authorized_user": shared["config"]["authorized_user"]
+            "authorized_user": shared["config"]["authorized_user"],
+            "has_pending": any(t <= now for t in retry_at),
+            # Emails backing off are retried when due, even if no mail arrives
+            "idle_timeout": min([IDLE_TIMEOUT] + [t - now for t in retry_at]),
+            # Given up on and left unread for a person; not fetched again
+            "failed": failed
         }
         
-    def exec(self, config):
+    async def exec_async(self, config):
         logger.info("Starting email check cycle")
-        logger.debug(f"Checking emails for authorized user: {config['authorized_user']}")
-        
-        emails = check_unread_emails(
-            username=config["username"],
-            password=config["password"]
-        )
-        
-        if not emails:
-            logger.info("No unread emails found")
-            return None
+        logger.debug("Checking emails for authorized user: %s", config['authorized_user'])
+        
+        if config["has_pending"]:
+            emails, ack = await asyncio.to_thread(check_unread_emails, config["username"], config["password"])
+            emails = [e for e in emails if e.message_id not in config["failed"]]
+            if not emails:
+                logger.info("No unread emails found, resuming unfinished emails")
+                return None
+        else:
+            logger.info(f"Waiting up to {config['idle_timeout']:.0f}s for unread emails")
+            emails, ack = await asyncio.to_thread(
+                idle_wait_for_unread, config["username"], config["password"],
+                timeout=config["idle_timeout"], skip=config["failed"]
+            )
+            if not emails:
+                logger.info("No unread emails found")
+                return None
             
         logger.info(f"Found {len(emails)} unread emails")
-        logger.debug(f"Email subjects: {[e.get('subject', 'No subject') for e in emails]}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Email subjects: %s", [e.subject or 'No subject' for e in emails])
             
         # Parse authorized user email
         authorized_email = email.utils.getaddresses([config["authorized_user"]])[0][1].lower().strip()
-        logger.debug(f"Parsed authorized email: {authorized_email}")
+        logger.debug("Parsed authorized email: %s", authorized_email)
             
-        # Filter for authorized user
+        # Filter for authorized user using the addresses normalized at fetch time
         authorized_emails = [
             e for e in emails 
-            if (email.utils.getaddresses([e["sender"]])[0][1].lower().strip() == authorized_email or
-                authorized_email in e["cc"] or
-                authorized_email in e["bcc"])
+            if (e.sender_addr == authorized_email or
+                authorized_email in e.cc_addrs or
+                authorized_email in e.bcc_addrs)
         ]
         
         if authorized_emails:
             logger.info(f"Found {len(authorized_emails)} emails involving authorized user")
-            for e in authorized_emails:
-                logger.debug(f"Authorized email - Subject: {e.get('subject', 'No subject')}, From: {e['sender']}")
+            # Only these bodies are downloaded, in one round-trip
+            await asyncio.to_thread(load_bodies, authorized_emails)
+            if logger.isEnabledFor(logging.DEBUG):
+                for e in authorized_emails:
+                    logger.debug("Authorized email - Subject: %s, From: %s", e.subject or 'No subject', e.sender)
         else:
             logger.info("No emails found involving authorized user")
         
-        return authorized_emails if authorized_emails else None
-
-    def post(self, shared, prep_res, exec_res):
-        if not exec_res:
-            logger.info("No emails to process, waiting 30s before next check")
-            time.sleep(30)
+        # post marks every fetched email read; the unauthorized ones are just ignored
+        return {"emails": authorized_emails, "fetched": emails, "ack": ack}
+
+    async def post_async(self, shared, prep_res, exec_res):
+        pending = shared["pending_emails"]
+        # Finished emails are removed by the batch flow, so anything left over
+        # is unfinished work from an earlier cycle or run
+        new_emails = exec_res["emails"] if exec_res else []
+        # Each entry keeps the Email record under "email" next to its processing state
+        for msg in new_emails:
+            if msg.message_id not in pending:
+                pending[msg.message_id] = {"email": msg}
+        if exec_res:
+            # Only now, with the emails safe in the pending store, mark the batch read
+            await asyncio.to_thread(exec_res["ack"], exec_res["fetched"])
+        
+        now = time.time()
+        if not any(is_due(msg, now) for msg in pending.values()):
+            logger.info("No emails to process, checking again")
             return "monitor"
         
-        # Reset and store new emails
-        shared["pending_emails"] = {
-            msg["message_id"]: msg for msg in exec_res
-        }
-        logger.info(f"Stored {len(shared['pending_emails'])} new emails for processing")
-        logger.debug(f"Message IDs: {list(shared['pending_emails'].keys())}")
-        return "analyze_batch"
-
-class EmailIntentAnalyzerNode(Node):
-    """Determines if email is for scheduling."""
-    def prep(self, shared):
-        email_id = self.params["email_id"]
-        logger.info(f"Analyzing intent of email {email_id}")
-        email = shared["pending_emails"][email_id]
-        logger.debug(f"Email subject: {email.get('subject', 'No subject')}, From: {email['sender']}")
-        return shared["pending_emails"][email_id]["body"], shared["config"]
-        
-    def exec(self, inputs):
-        email_body, config = inputs
-        logger.debug("Calling LLM to analyze email intent")
-        prompt = f"""You are the AI scheduler for User: {config["authorized_user"]}
-
-Email:
-{email_body}
-
-Determine if this email is about scheduling a meeting.
-
-Output in yaml:
-```yaml
-is_scheduling: true/false
-reason: why this classification
-```"""
-        response = call_llm(prompt)
-        yaml_str = response.split("```yaml")[1].split("```")[0].strip()
-        result = yaml.safe_load(yaml_str)
-        logger.info(f"Email classified as {'scheduling' if result['is_scheduling'] else 'non-scheduling'}")
-        logger.debug(f"Classification reason: {result['reason']}")
-        return result
+        # One canonical "today" for the whole batch
+        shared["_timeframe_ctx"] = build_timeframe_ctx(datetime.now())
         
-    def post(self, shared, prep_res, exec_res):
-        email_id = self.params["email_id"]
-        if exec_res["is_scheduling"]:
-            logger.info(f"Email {email_id} is about scheduling, proceeding to extract details")
-            return "extract_availability_range"
-        logger.info(f"Email {email_id} is not about scheduling, removing from queue")
-        del shared["pending_emails"][email_id]
-        return "end"
+        logger.info(f"Stored {len(new_emails)} new emails, {len(pending)} pending processing")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Message IDs: %s", list(pending.keys()))
+        return "analyze_batch"
 
-class AvailabilityRangeExtractorNode(Node):
-    """Extracts time range and meeting details."""
-    def prep(self, shared):
+class ResumeRouterNode(AsyncNode):
+    """Routes each pending email to the first stage it has not completed."""
+    STAGE_ACTIONS = {
+        None: "analyze",
+        "range_extracted": "check_availability",
+        "checked": "decide_next_action",
+        "scheduled": "send_confirmation",
+        "drafted": "send_email"
+    }
+    
+    async def prep_async(self, shared):
+        msg = shared["pending_emails"][self.params["email_id"]]
+        return msg.get("stage"), msg.get("request", {}).get("next_action")
+        
+    async def exec_async(self, inputs):
+        stage, next_action = inputs
+        # After the decision, the route depends on what was decided
+        return next_action if stage == "decided" else self.STAGE_ACTIONS[stage]
+        
+    async def post_async(self, shared, prep_res, exec_res):
+        if prep_res[0]:
+            logger.info(f"Resuming email {self.params['email_id']} after stage '{prep_res[0]}'")
+        return exec_res
+
+class EmailClassifyAndExtractNode(AsyncNode):
+    """Determines if email is for scheduling and, if so, extracts time range and meeting details."""
+    async def prep_async(self, shared):
         email_id = self.params["email_id"]
-        logger.info(f"Extracting availability range from email {email_id}")
-        msg = shared["pending_emails"][email_id]
-        logger.debug(f"Email details - Subject: {msg.get('subject', 'No subject')}, From: {msg['sender']}")
-        return msg["body"], msg["sender"], msg.get("to", []), msg.get("cc", []), msg.get("bcc", []), shared["config"]
+        logger.info(f"Analyzing email {email_id}")
+        msg = shared["pending_emails"][email_id]["email"]
+        logger.debug("Email details - Subject: %s, From: %s", msg.subject or 'No subject', msg.sender)
+        ctx = shared.get("_timeframe_ctx") or build_timeframe_ctx(datetime.now())
+        return {
+            "email_body": msg.body,
+            "subject": msg.subject,
+            "sender": msg.sender,
+            "sender_addr": msg.sender_addr,
+            "to": list(msg.to),
+            "cc": list(msg.cc),
+            "bcc": list(msg.bcc),
+            "config": shared["config"],
+            "ctx": ctx
+        }
         
-    def exec(self, inputs):
-        email_body, sender, to_list, cc_list, bcc_list, config = inputs
-        logger.debug(f"Processing email from {sender} with {len(to_list)} To, {len(cc_list)} CC and {len(bcc_list)} BCC recipients")
+    async def exec_async(self, inputs):
+        email_body, config, ctx = inputs["email_body"], inputs["config"], inputs["ctx"]
+        to_list, cc_list, bcc_list = inputs["to"], inputs["cc"], inputs["bcc"]
         
-        # Calculate default timeframe (next week)
-        today = datetime.now()
-        this_week_end = today + timedelta(days=(6 - today.weekday()))
-        next_monday = today + timedelta(days=(7 - today.weekday()))
-        next_friday = next_monday + timedelta(days=4)
+        # Clear-cut non-scheduling emails need no LLM call at all
+        if not _SCHED_RE.search(email_body) and not _SCHED_RE.search(inputs["subject"]):
+            logger.info("Email classified as non-scheduling, no scheduling keywords")
+            return {"is_scheduling": False, "reason": "no scheduling keywords in subject or body"}
         
-        logger.debug(f"Default timeframes - This week: until {this_week_end.strftime('%Y-%m-%d')}, Next week: {next_monday.strftime('%Y-%m-%d')} to {next_friday.strftime('%Y-%m-%d')}")
+        logger.debug("Processing email from %s with %s To, %s CC and %s BCC recipients", inputs["sender"], len(to_list), len(cc_list), len(bcc_list))
+        logger.debug("Default timeframes - This week: until %s, Next week: %s to %s", ctx.this_week_end_str, ctx.next_monday_str, ctx.next_friday_str)
         
         prompt = f"""You are the AI scheduler for User: {config["authorized_user"]}
 
-Today's date: {today.strftime("%Y-%m-%d")}
-Current week ends: {this_week_end.strftime("%Y-%m-%d")}
-Next week: {next_monday.strftime("%Y-%m-%d")} to {next_friday.strftime("%Y-%m-%d")}
+Today's date: {ctx.today_str}
+Current week ends: {ctx.this_week_end_str}
+Next week: {ctx.next_monday_str} to {ctx.next_friday_str}
 
 Email participants:
 User (I schedule for): {config["authorized_user"]}
 Email Account Used: {config["email"]["username"]}
-From: {sender}
+From: {inputs["sender"]}
 To: {', '.join(to_list) if to_list else 'None'}
 CC: {', '.join(cc_list) if cc_list else 'None'}
 BCC: {', '.join(bcc_list) if bcc_list else 'None'}
@@ -160,7 +287,10 @@ BCC: {', '.join(bcc_list) if bcc_list else 'None'}
 Email:
 {email_body}
 
-Extract meeting details with these rules:
+First determine if this email is about scheduling a meeting.
+If it is not, output only is_scheduling and reason.
+
+If it is, extract meeting details with these rules:
 1. For timeframe:
    - If specific times/ranges given (e.g. "Tuesday 2-3pm, Wednesday 1-4pm"):
      - Use earliest time as start
@@ -182,6 +312,9 @@ Extract meeting details with these rules:
 
 Output in yaml:
 ```yaml
+is_scheduling: true/false
+reason: why this classification, and how the timeframe was determined
+# the fields below only when is_scheduling is true
 duration: duration in minutes
 timeframe:
   start: YYYY-MM-DD HH:MM ET
@@ -190,15 +323,20 @@ attendees:
   - email1@example.com
 location: optional meeting location/link
 description: meeting description/agenda
-reason: explanation of how timeframe was determined
 ```"""
-        logger.debug("Calling LLM to extract meeting details")
-        response = call_llm(prompt)
-        yaml_str = response.split("```yaml")[1].split("```")[0].strip()
-        result = yaml.safe_load(yaml_str)
+        logger.debug("Calling LLM to classify email and extract meeting details")
+        response = await call_llm_async(prompt)
+        yaml_str = extract_yaml(response)
+        result = load_yaml(yaml_str)
         
-        # Validate required fields
         assert isinstance(result, dict), "Result must be a dictionary"
+        assert "is_scheduling" in result, "is_scheduling is required"
+        if not result["is_scheduling"]:
+            logger.info("Email classified as non-scheduling")
+            logger.debug("Classification reason: %s", result.get('reason'))
+            return result
+        
+        # Validate required fields
         assert "duration" in result, "Duration is required"
         assert isinstance(result["duration"], int), "Duration must be an integer"
         assert "timeframe" in result, "Timeframe is required"
@@ -209,50 +347,58 @@ reason: explanation of how timeframe was determined
         
         # Convert times to datetime
         try:
-            result["timeframe"]["start"] = datetime.strptime(result["timeframe"]["start"], "%Y-%m-%d %H:%M ET")
-            result["timeframe"]["end"] = datetime.strptime(result["timeframe"]["end"], "%Y-%m-%d %H:%M ET")
+            result["timeframe"]["start"] = parse_et(result["timeframe"]["start"])
+            result["timeframe"]["end"] = parse_et(result["timeframe"]["end"])
         except ValueError as e:
             logger.error(f"Failed to parse datetime: {e}")
             raise
             
         # Validate timeframe logic
         assert result["timeframe"]["start"] < result["timeframe"]["end"], "Start time must be before end time"
-        assert result["timeframe"]["start"] >= today, "Start time cannot be in the past"
+        assert result["timeframe"]["start"] >= ctx.today, "Start time cannot be in the past"
         
-        # Add all participants
-        result.setdefault("attendees", [])
-        for addr in [sender] + cc_list + bcc_list:
-            email_addr = email.utils.getaddresses([addr])[0][1].lower().strip()
+        # Add all participants (cc/bcc are already normalized by check_unread_emails)
+        result["attendees"] = result.get("attendees") or []
+        for email_addr in [inputs["sender_addr"]] + cc_list + bcc_list:
             if email_addr not in result["attendees"]:
                 result["attendees"].append(email_addr)
         
         # Set default location if not provided
         result.setdefault("location", "")
         
-        logger.info(f"Extracted meeting details - Duration: {result['duration']}min, Timeframe: {result['reason']}")
-        logger.debug(f"Meeting timeframe: {result['timeframe']['start']} to {result['timeframe']['end']}")
-        logger.debug(f"Meeting description: {result['description']}")
-        logger.debug(f"Attendees: {', '.join(result['attendees'])}")
+        logger.info(f"Email classified as scheduling - Duration: {result['duration']}min, Timeframe: {result['reason']}")
+        logger.debug("Meeting timeframe: %s to %s", result['timeframe']['start'], result['timeframe']['end'])
+        logger.debug("Meeting description: %s", result['description'])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Attendees: %s", ', '.join(result['attendees']))
         return result
         
-    def post(self, shared, prep_res, exec_res):
+    async def post_async(self, shared, prep_res, exec_res):
         email_id = self.params["email_id"]
-        shared["pending_emails"][email_id]["request"] = {
+        if not exec_res["is_scheduling"]:
+            logger.info(f"Email {email_id} is not about scheduling, removing from queue")
+            del shared["pending_emails"][email_id]
+            return "end"
+        del exec_res["is_scheduling"]
+        msg = shared["pending_emails"][email_id]
+        msg["request"] = {
             "status": "pending",
             "meeting": exec_res,
             "available_slots": [],
             "chosen_slot": None
         }
+        msg["stage"] = "range_extracted"
+        shared["pending_emails"][email_id] = msg
         logger.info(f"Created meeting request for email {email_id}")
         return "check_availability"
 
-class AvailabilityCheckerNode(Node):
+class AvailabilityCheckerNode(AsyncNode):
     """Checks calendar for available slots."""
-    def prep(self, shared):
+    async def prep_async(self, shared):
         email_id = self.params["email_id"]
         request = shared["pending_emails"][email_id]["request"]
         logger.info(f"Checking calendar availability for email {email_id}")
-        logger.debug(f"Checking from {request['meeting']['timeframe']['start']} to {request['meeting']['timeframe']['end']}")
+        logger.debug("Checking from %s to %s", request['meeting']['timeframe']['start'], request['meeting']['timeframe']['end'])
         return {
             "start_time": request["meeting"]["timeframe"]["start"],
             "end_time": request["meeting"]["timeframe"]["end"],
@@ -260,9 +406,10 @@ class AvailabilityCheckerNode(Node):
             "working_hours": shared["config"]["calendar"]["working_hours"]
         }
         
-    def exec(self, inputs):
-        logger.debug(f"Searching for {inputs['duration']}min slots between {inputs['start_time']} and {inputs['end_time']}")
-        slots = check_availability(
+    async def exec_async(self, inputs):
+        logger.debug("Searching for %smin slots between %s and %s", inputs['duration'], inputs['start_time'], inputs['end_time'])
+        slots = await asyncio.to_thread(
+            check_availability,
             start_time=inputs["start_time"],
             end_time=inputs["end_time"],
             min_duration=timedelta(minutes=inputs["duration"]),
@@ -270,33 +417,77 @@ class AvailabilityCheckerNode(Node):
         )
         if slots:
             logger.info(f"Found {len(slots)} available time slots")
-            for i, (start, end) in enumerate(slots, 1):
-                logger.debug(f"Slot {i}: {start} to {end}")
+            if logger.isEnabledFor(logging.DEBUG):
+                for i, (start, end) in enumerate(slots, 1):
+                    logger.debug("Slot %s: %s to %s", i, start, end)
         else:
             logger.warning("No available time slots found")
         return slots
         
-    def post(self, shared, prep_res, exec_res):
+    async def post_async(self, shared, prep_res, exec_res):
         email_id = self.params["email_id"]
-        shared["pending_emails"][email_id]["request"]["available_slots"] = exec_res
+        msg = shared["pending_emails"][email_id]
+        msg["request"]["available_slots"] = exec_res
+        msg["stage"] = "checked"
+        shared["pending_emails"][email_id] = msg
         logger.info(f"Stored {len(exec_res) if exec_res else 0} available slots for email {email_id}")
         return "decide_next_action"
 
-class ActionDeciderNode(Node):
+class ActionDeciderNode(AsyncNode):
     """Decides whether to schedule or propose times."""
-    def prep(self, shared):
+    async def prep_async(self, shared):
         email_id = self.params["email_id"]
         email = shared["pending_emails"][email_id]
         request = email["request"]
         logger.info(f"Deciding next action for email {email_id}")
         return {
-            "email_body": email["body"],
+            "email_body": email["email"].body,
             "available_slots": request["available_slots"],
             "meeting": request["meeting"],
-            "config": shared["config"]
+            "config": shared["config"],
+            "today": (shared.get("_timeframe_ctx") or build_timeframe_ctx(datetime.now())).today
+        }
+    
+    @staticmethod
+    def decide_without_llm(inputs) -> Optional[Dict]:
+        """Decide mechanically when the email's time expressions make it unambiguous.
+        
+        Returns None when the LLM has to decide.
+        """
+        parsed = search_dates(
+            inputs["email_body"], languages=["en"], settings={"PREFER_DATES_FROM": "future", "RELATIVE_BASE": inputs["today"]}
+        ) or []
+        if not parsed:
+            return {"action": "ask_time", "reason": "email mentions no dates or times", "chosen_slot": None}
+        
+        meeting = inputs["meeting"]
+        duration = timedelta(minutes=meeting["duration"])
+        # Only phrases with an explicit clock time inside the requested range can
+        # pick a slot; "Tuesday" or "next week" parse with an arbitrary time of day
+        times = {
+            dt for text, dt in parsed
+            if _CLOCK_TIME_RE.search(text) and meeting["timeframe"]["start"] <= dt <= meeting["timeframe"]["end"]
+        }
+        if len(times) != 1:
+            return None
+        (dt,) = times
+        matches = [(start, end) for start, end in inputs["available_slots"] if start <= dt and dt + duration <= end]
+        if len(matches) != 1:
+            return None
+        return {
+            "action": "schedule",
+            "reason": f"email asks for {dt:%Y-%m-%d %H:%M}, which fits one available slot",
+            "chosen_slot": (dt, dt + duration)
         }
         
-    def exec(self, inputs):
+    async def exec_async(self, inputs):
+        if search_dates is not None:
+            result = await asyncio.to_thread(self.decide_without_llm, inputs)
+            if result is not None:
+                logger.info(f"Decided action without LLM: {result['action']}")
+                logger.debug("Decision reason: %s", result['reason'])
+                return result
+        
         logger.debug("Calling LLM to analyze scheduling action")
         # Format slots for LLM
         slots_text = []
@@ -326,35 +517,36 @@ action: schedule/ask_time
 reason: detailed explanation of decision
 chosen_slot: null or "YYYY-MM-DD HH:MM ET to HH:MM ET" if scheduling
 ```"""
-        response = call_llm(prompt)
-        yaml_str = response.split("```yaml")[1].split("```")[0].strip()
-        result = yaml.safe_load(yaml_str)
+        response = await call_llm_async(prompt)
+        yaml_str = extract_yaml(response)
+        result = load_yaml(yaml_str)
         
         # Convert chosen_slot to datetime tuple if present
         if result["action"] == "schedule" and result["chosen_slot"]:
-            start_str, end_str = result["chosen_slot"].split(" to ")
-            start = datetime.strptime(start_str, "%Y-%m-%d %H:%M ET")
-            end = datetime.strptime(f"{start_str.split(' ')[0]} {end_str}", "%Y-%m-%d %H:%M ET")
-            result["chosen_slot"] = (start, end)
+            result["chosen_slot"] = parse_slot(result["chosen_slot"])
             
         logger.info(f"Decided action: {result['action']}")
-        logger.debug(f"Decision reason: {result['reason']}")
+        logger.debug("Decision reason: %s", result['reason'])
         if result["chosen_slot"]:
-            logger.debug(f"Chosen slot: {result['chosen_slot']}")
+            logger.debug("Chosen slot: %s", result['chosen_slot'])
         return result
         
-    def post(self, shared, prep_res, exec_res):
+    async def post_async(self, shared, prep_res, exec_res):
         email_id = self.params["email_id"]
+        msg = shared["pending_emails"][email_id]
         if exec_res["action"] == "schedule":
-            shared["pending_emails"][email_id]["request"]["chosen_slot"] = exec_res["chosen_slot"]
+            msg["request"]["chosen_slot"] = exec_res["chosen_slot"]
             logger.info("Can schedule meeting, proceeding to scheduler")
-            return "schedule"
-        logger.info("Need to ask for preferences, proceeding to proposal")
-        return "ask_time"
+        else:
+            logger.info("Need to ask for preferences, proceeding to proposal")
+        msg["request"]["next_action"] = exec_res["action"]
+        msg["stage"] = "decided"
+        shared["pending_emails"][email_id] = msg
+        return exec_res["action"]
 
-class MeetingSchedulerNode(Node):
+class MeetingSchedulerNode(AsyncNode):
     """Creates calendar event for chosen time slot."""
-    def prep(self, shared):
+    async def prep_async(self, shared):
         email_id = self.params["email_id"]
         request = shared["pending_emails"][email_id]["request"]
         logger.info(f"Preparing to schedule meeting for email {email_id}")
@@ -363,9 +555,9 @@ class MeetingSchedulerNode(Node):
             "chosen_slot": request["chosen_slot"]
         }
         
-    def exec(self, inputs):
+    async def exec_async(self, inputs):
         start_time, end_time = inputs["chosen_slot"]
-        logger.debug(f"Scheduling meeting from {start_time} to {end_time}")
+        logger.debug("Scheduling meeting from %s to %s", start_time, end_time)
         
         meeting_details = {
             "title": inputs["meeting"]["description"],
@@ -376,59 +568,122 @@ class MeetingSchedulerNode(Node):
             "location": inputs["meeting"].get("location", "")
         }
         
-        event = schedule_meeting(meeting_details)
+        event = await asyncio.to_thread(schedule_meeting, meeting_details)
         logger.info("Meeting scheduled successfully")
-        logger.debug(f"Event link: {event.get('htmlLink')}")
+        # Cached freeBusy results predate this event and would offer its slot again
+        await asyncio.to_thread(clear_busy_cache)
+        logger.debug("Event link: %s", event.get('htmlLink'))
         return event
         
-    def post(self, shared, prep_res, exec_res):
+    async def post_async(self, shared, prep_res, exec_res):
         email_id = self.params["email_id"]
-        shared["pending_emails"][email_id]["request"]["status"] = "scheduled"
-        shared["pending_emails"][email_id]["request"]["event"] = exec_res
+        msg = shared["pending_emails"][email_id]
+        msg["request"]["status"] = "scheduled"
+        msg["request"]["event"] = exec_res
+        msg["stage"] = "scheduled"
+        shared["pending_emails"][email_id] = msg
         return "send_confirmation"
 
-class ScheduleConfirmationEmailNode(Node):
-    """Drafts confirmation email for scheduled meeting."""
-    def prep(self, shared):
+class DraftEmailNode(AsyncNode, ABC):
+    """
+    Drafts a reply from a local template, or with the LLM when personalized emails are enabled.
+    
+    Subclasses set template_name and kind, and implement build_prompt.
+    """
+    template_name = None
+    kind = "reply"
+    
+    async def prep_async(self, shared):
         email_id = self.params["email_id"]
-        email = shared["pending_emails"][email_id]
-        request = email["request"]
-        logger.info(f"Preparing confirmation email for {email_id}")
+        entry = shared["pending_emails"][email_id]
+        request, original = entry["request"], entry["email"]
+        logger.info(f"Preparing {self.kind} email for {email_id}")
         
         return {
+            "request": request,
             "meeting": request["meeting"],
-            "event": request["event"],
             "config": shared["config"],
             "threading": {
-                "message_id": email["message_id"],
-                "references": email.get("references", []),
-                "subject": email.get("subject", "Meeting Coordination")
+                "message_id": original.message_id,
+                "references": list(original.references)
             },
-            "original_subject": email.get("subject", "Meeting Coordination"),
-            "sender": email["sender"],
-            "to": email.get("to", []),
-            "cc": email.get("cc", []),
-            "bcc": email.get("bcc", [])
+            "original_subject": original.subject or "Meeting Coordination",
+            "sender": original.sender,
+            "to": list(original.to),
+            "cc": list(original.cc),
+            "bcc": list(original.bcc)
         }
-        
-    def exec(self, inputs):
-        start_time = datetime.fromisoformat(inputs["event"]["start"]["dateTime"])
-        end_time = datetime.fromisoformat(inputs["event"]["end"]["dateTime"])
-        
-        prompt = f"""You are the AI scheduler for User: {inputs["config"]["authorized_user"]}
-
+    
+    def template_values(self, inputs) -> Dict:
+        """Values substituted into the template; subclasses add their own."""
+        return {"duration": inputs["meeting"]["duration"]}
+    
+    @abstractmethod
+    def build_prompt(self, inputs) -> str:
+        """The LLM prompt for a personalized draft."""
+        
+    async def exec_async(self, inputs):
+        if not inputs["config"].get("personalized_emails", False):
+            logger.debug("Rendering %s email from template %s", self.kind, self.template_name)
+            return {"body": render_template(self.template_name, **self.template_values(inputs))}
+        
+        logger.debug("Calling LLM to draft %s email", self.kind)
+        response = await call_llm_async(self.build_prompt(inputs))
+        yaml_str = extract_yaml(response)
+        return load_yaml(yaml_str)
+        
+    async def post_async(self, shared, prep_res, exec_res):
+        email_id = self.params["email_id"]
+        msg = shared["pending_emails"][email_id]
+        msg["draft_email"] = {
+            "subject": prep_res["original_subject"],
+            "body": exec_res["body"]
+        }
+        msg["stage"] = "drafted"
+        shared["pending_emails"][email_id] = msg
+        return "send_email"
 
-Original email:
+def _recipients_block(inputs) -> str:
+    return f"""Original email:
 - From: {inputs['sender']}
 - To: {', '.join(inputs['to'])}
 - CC: {', '.join(inputs['cc'])}
 - BCC: {', '.join(inputs['bcc'])}
-- Subject: {inputs['original_subject']}
+- Subject: {inputs['original_subject']}"""
 
-Draft a confirmation email for a {inputs['meeting']['duration']}-minute meeting.
-The meeting is scheduled for {start_time.strftime('%I:%M %p ET on %B %d, %Y')} to {end_time.strftime('%I:%M %p ET')}.
+def _format_slots(slots) -> str:
+    return "\n".join(
+        f"- {start.strftime('%I:%M %p ET on %B %d, %Y')} to {end.strftime('%I:%M %p ET')}"
+        for start, end in slots
+    )
 
-Calendar link: {inputs['event'].get('htmlLink')}
+class ScheduleConfirmationEmailNode(DraftEmailNode):
+    """Drafts confirmation email for scheduled meeting."""
+    template_name = "confirmation.txt"
+    kind = "confirmation"
+    
+    def template_values(self, inputs):
+        event = inputs["request"]["event"]
+        start_time = datetime.fromisoformat(event["start"]["dateTime"])
+        end_time = datetime.fromisoformat(event["end"]["dateTime"])
+        return {
+            **super().template_values(inputs),
+            "start": start_time.strftime('%I:%M %p ET on %B %d, %Y'),
+            "end": end_time.strftime('%I:%M %p ET'),
+            "calendar_link": event.get("htmlLink", "")
+        }
+    
+    def build_prompt(self, inputs):
+        values = self.template_values(inputs)
+        return f"""You are the AI scheduler for User: {inputs["config"]["authorized_user"]}
+
+
+{_recipients_block(inputs)}
+
+Draft a confirmation email for a {values['duration']}-minute meeting.
+The meeting is scheduled for {values['start']} to {values['end']}.
+
+Calendar link: {values['calendar_link']}
 
 Draft a brief email that:
 1. Confirms the scheduled time
@@ -441,63 +696,27 @@ Output in yaml:
 body: |
     email body
 ```"""
-        logger.debug("Calling LLM to draft confirmation email")
-        response = call_llm(prompt)
-        yaml_str = response.split("```yaml")[1].split("```")[0].strip()
-        email_content = yaml.safe_load(yaml_str)
-        return email_content
-        
-    def post(self, shared, prep_res, exec_res):
-        email_id = self.params["email_id"]
-        shared["pending_emails"][email_id]["draft_email"] = {
-            "subject": shared["pending_emails"][email_id].get("subject", "Meeting Coordination"),
-            "body": exec_res["body"]
-        }
-        return "send_email"
 
-class ProposalEmailNode(Node):
-    """Drafts and sends email with available slots."""
-    def prep(self, shared):
-        email_id = self.params["email_id"]
-        email = shared["pending_emails"][email_id]
-        request = email["request"]
-        logger.info(f"Preparing to send proposal email for {email_id}")
-        
-        return {
-            "slots": request["available_slots"],
-            "meeting": request["meeting"],
-            "config": shared["config"],
-            "threading": {
-                "message_id": email["message_id"],
-                "references": email.get("references", [])
-            },
-            "original_subject": email.get("subject", "Meeting Coordination"),
-            "sender": email["sender"],
-            "to": email.get("to", []),
-            "cc": email.get("cc", []),
-            "bcc": email.get("bcc", [])
-        }
-        
-    def exec(self, inputs):
-        logger.debug(f"Drafting proposal email with {len(inputs['slots'])} time slots")
-        # Format slots for email
-        slots_text = []
-        for start, end in inputs["slots"]:
-            slots_text.append(f"- {start.strftime('%I:%M %p ET on %B %d, %Y')} to {end.strftime('%I:%M %p ET')}")
-            
-        prompt = f"""You are the AI scheduler for User: {inputs["config"]["authorized_user"]}
+class ProposalEmailNode(DraftEmailNode):
+    """Drafts email with available slots."""
+    template_name = "proposal.txt"
+    kind = "proposal"
+    
+    def template_values(self, inputs):
+        slots = inputs["request"]["available_slots"]
+        logger.debug("Drafting proposal email with %s time slots", len(slots))
+        return {**super().template_values(inputs), "slots": _format_slots(slots)}
+    
+    def build_prompt(self, inputs):
+        values = self.template_values(inputs)
+        return f"""You are the AI scheduler for User: {inputs["config"]["authorized_user"]}
 
-Original email:
-- From: {inputs['sender']}
-- To: {', '.join(inputs['to'])}
-- CC: {', '.join(inputs['cc'])}
-- BCC: {', '.join(inputs['bcc'])}
-- Subject: {inputs['original_subject']}
+{_recipients_block(inputs)}
 
-Draft a concise email proposing times for a {inputs['meeting']['duration']}-minute meeting.
+Draft a concise email proposing times for a {values['duration']}-minute meeting.
 
 Available slots:
-{chr(10).join(slots_text)}
+{values['slots']}
 
 Draft a brief email that:
 1. Lists the available time slots
@@ -510,53 +729,16 @@ Output in yaml:
 body: |
     email body
 ```"""
-        logger.debug("Calling LLM to draft proposal email")
-        response = call_llm(prompt)
-        yaml_str = response.split("```yaml")[1].split("```")[0].strip()
-        email_content = yaml.safe_load(yaml_str)
-        
-        return email_content
-        
-    def post(self, shared, prep_res, exec_res):
-        email_id = self.params["email_id"]
-        shared["pending_emails"][email_id]["draft_email"] = {
-            "subject": shared["pending_emails"][email_id].get("subject", "Meeting Coordination"),
-            "body": exec_res["body"]
-        }
-        return "send_email"
 
-class NoSlotsEmailNode(Node):
-    """Sends email when no slots are available."""
-    def prep(self, shared):
-        email_id = self.params["email_id"]
-        email = shared["pending_emails"][email_id]
-        request = email["request"]
-        logger.info(f"Preparing to send no-slots email for {email_id}")
-        
-        return {
-            "meeting": request["meeting"],
-            "config": shared["config"],
-            "threading": {
-                "message_id": email["message_id"],
-                "references": email.get("references", [])
-            },
-            "original_subject": email.get("subject", "Meeting Coordination"),
-            "sender": email["sender"],
-            "to": email.get("to", []),
-            "cc": email.get("cc", []),
-            "bcc": email.get("bcc", [])
-        }
-        
-    def exec(self, inputs):
-        logger.debug("Drafting no-slots email")
-        prompt = f"""You are the AI scheduler for User: {inputs["config"]["authorized_user"]}
+class NoSlotsEmailNode(DraftEmailNode):
+    """Drafts email when no slots are available."""
+    template_name = "no_slots.txt"
+    kind = "no-slots"
+    
+    def build_prompt(self, inputs):
+        return f"""You are the AI scheduler for User: {inputs["config"]["authorized_user"]}
 
-Original email:
-- From: {inputs['sender']}
-- To: {', '.join(inputs['to'])}
-- CC: {', '.join(inputs['cc'])}
-- BCC: {', '.join(inputs['bcc'])}
-- Subject: {inputs['original_subject']}
+{_recipients_block(inputs)}
 
 Draft an email explaining no slots are available for a {inputs['meeting']['duration']}-minute meeting.
 
@@ -571,23 +753,10 @@ Output in yaml:
 body: |
     email body
 ```"""
-        logger.debug("Calling LLM to draft no-slots email")
-        response = call_llm(prompt)
-        yaml_str = response.split("```yaml")[1].split("```")[0].strip()
-        email_content = yaml.safe_load(yaml_str)
-        return email_content
-        
-    def post(self, shared, prep_res, exec_res):
-        email_id = self.params["email_id"]
-        shared["pending_emails"][email_id]["draft_email"] = {
-            "subject": shared["pending_emails"][email_id].get("subject", "Meeting Coordination"),
-            "body": exec_res["body"]
-        }
-        return "send_email"
 
-class EmailSenderNode(Node):
+class EmailSenderNode(AsyncNode):
     """Sends drafted email with proper threading."""
-    def prep(self, shared):
+    async def prep_async(self, shared):
         email_id = self.params["email_id"]
         email = shared["pending_emails"][email_id]
         draft = email["draft_email"]
@@ -596,20 +765,29 @@ class EmailSenderNode(Node):
         return {
             "draft": draft,
             "meeting": email["request"]["meeting"],
+            "bcc_addrs": email["email"].bcc_addrs,
             "email_config": shared["config"]["email"],
             "threading": {
-                "message_id": email["message_id"],
-                "references": email.get("references", [])
+                "message_id": email["email"].message_id,
+                "references": list(email["email"].references)
             }
         }
         
-    def exec(self, inputs):
-        logger.debug(f"Sending email with subject: {inputs['draft']['subject']}")
+    async def exec_async(self, inputs):
+        logger.debug("Sending email with subject: %s", inputs['draft']['subject'])
+        
+        # Attendees who were Bcc'd on the request stay hidden on the reply
+        to_emails, bcc_emails = [], []
+        for attendee in inputs["meeting"]["attendees"]:
+            hidden = email.utils.parseaddr(attendee)[1].lower() in inputs["bcc_addrs"]
+            (bcc_emails if hidden else to_emails).append(attendee)
         
-        send_email(
+        # Sent on the event loop over pooled asyncio SMTP connections, no worker thread
+        await send_email_async(
             subject=inputs["draft"]["subject"],
             body=inputs["draft"]["body"],
-            to_emails=inputs["meeting"]["attendees"],
+            to_emails=to_emails,
+            bcc_emails=bcc_emails,
             from_email=inputs["email_config"]["username"],
             app_password=inputs["email_config"]["password"],
             in_reply_to=inputs["threading"]["message_id"],
@@ -618,19 +796,67 @@ class EmailSenderNode(Node):
         logger.info("Email sent successfully")
         return True
         
-    def post(self, shared, prep_res, exec_res):
+    async def post_async(self, shared, prep_res, exec_res):
+        email_id = self.params["email_id"]
+        del shared["pending_emails"][email_id]
+        logger.info(f"Finished processing email {email_id}")
         return "end"
 
-class EmailAnalysisBatchFlow(BatchFlow):
-    """Batch processes multiple emails."""
-    def prep(self, shared):
-        logger.info(f"Starting batch analysis of {len(shared['pending_emails'])} emails")
-        return [{"email_id": email_id} for email_id in shared["pending_emails"].keys()]
+class EmailAnalysisBatchFlow(AsyncParallelBatchFlow):
+    """Processes multiple emails concurrently."""
+    async def prep_async(self, shared):
+        now = time.time()
+        due = [email_id for email_id, msg in shared["pending_emails"].items() if is_due(msg, now)]
+        logger.info(f"Starting batch analysis of {len(due)} emails")
+        return [{"email_id": email_id} for email_id in due]
+
+    async def _orch_async(self, shared, params=None):
+        # Contain each email's failure: gather would otherwise abort the whole
+        # batch, and on restart the same email would fail again
+        try:
+            return await super()._orch_async(shared, params)
+        except Exception as e:
+            await self.record_failure(shared, params["email_id"], e)
+
+    @staticmethod
+    async def record_failure(shared, email_id: str, error: Exception):
+        """
+        Count a failed run in the email's entry and back off before the next one.
+        
+        After MAX_EMAIL_ATTEMPTS the email is given up on: it was marked read
+        when fetched, so it is marked unread again for a person to see, and
+        its entry stays in the pending store flagged "failed" so it is not
+        fetched again. Deleting the entry makes the scheduler retry it.
+        """
+        pending = shared["pending_emails"]
+        msg = pending.get(email_id)
+        if msg is None:
+            logger.error(f"Email {email_id} failed after leaving the queue", exc_info=error)
+            return
+        msg["attempts"] = msg.get("attempts", 0) + 1
+        msg["error"] = f"{msg.get('stage') or 'new'}: {error!r}"
+        if msg["attempts"] < MAX_EMAIL_ATTEMPTS:
+            delay = RETRY_BACKOFF * 2 ** (msg["attempts"] - 1)
+            msg["next_attempt_at"] = time.time() + delay
+            pending[email_id] = msg
+            logger.warning(f"Email {email_id} failed (attempt {msg['attempts']}/{MAX_EMAIL_ATTEMPTS}), "
+                           f"retrying in {delay}s: {msg['error']}", exc_info=error)
+            return
+        msg["failed"] = True
+        pending[email_id] = msg
+        logger.error(f"Giving up on email {email_id} ({msg['email'].subject or 'No subject'}) "
+                     f"after {msg['attempts']} failed attempts, last error at {msg['error']}",
+                     exc_info=error)
+        try:
+            await asyncio.to_thread(mark_unread, [msg["email"]],
+                                    shared["config"]["email"]["username"], shared["config"]["email"]["password"])
+        except Exception:
+            logger.exception(f"Could not mark email {email_id} unread again")
 
 # Create nodes
 email_fetcher = EmailFetcherNode()
-email_analyzer = EmailIntentAnalyzerNode()
-range_extractor = AvailabilityRangeExtractorNode()
+resume_router = ResumeRouterNode()
+email_analyzer_and_extractor = EmailClassifyAndExtractNode()
 availability_checker = AvailabilityCheckerNode()
 action_decider = ActionDeciderNode()
 meeting_scheduler = MeetingSchedulerNode()
@@ -639,11 +865,18 @@ time_proposal = ProposalEmailNode()
 no_slots = NoSlotsEmailNode()
 email_sender = EmailSenderNode()
 
-# Connect nodes in the batch flow
-email_analyzer - "extract_availability_range" >> range_extractor
-email_analyzer - "end" >> None
+# Connect nodes in the batch flow; the router skips stages already completed
+resume_router - "analyze" >> email_analyzer_and_extractor
+resume_router - "check_availability" >> availability_checker
+resume_router - "decide_next_action" >> action_decider
+resume_router - "schedule" >> meeting_scheduler
+resume_router - "ask_time" >> time_proposal
+resume_router - "send_confirmation" >> schedule_confirmation
+resume_router - "send_email" >> email_sender
+
+email_analyzer_and_extractor - "check_availability" >> availability_checker
+email_analyzer_and_extractor - "end" >> None
 
-range_extractor - "check_availability" >> availability_checker
 availability_checker - "decide_next_action" >> action_decider
 
 action_decider - "schedule" >> meeting_scheduler
@@ -655,8 +888,8 @@ time_proposal - "send_email" >> email_sender
 
 email_sender - "end" >> None
 
-# Create batch flow
-email_analysis = EmailAnalysisBatchFlow(start=email_analyzer)
+# Create parallel batch flow
+email_analysis = EmailAnalysisBatchFlow(start=resume_router)
 
 # Connect main flow
 email_fetcher - "monitor" >> email_fetcher
@@ -664,5 +897,5 @@ email_fetcher - "analyze_batch" >> email_analysis
 email_analysis - "default" >> email_fetcher
 
 # Create main flow
-scheduler_flow = Flow(start=email_fetcher)
+scheduler_flow = AsyncFlow(start=email_fetcher)
 
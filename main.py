@@ -0,0 +1,32 @@
+import asyncio
+import os
+import yaml
+
+from flow import scheduler_flow
+from utils.check_unread_emails import stop_waiting
+from utils.send_email import close_all as close_smtp, close_all_async as close_async_smtp
+
+async def run(shared):
+    """Run the flow, then log out of the async SMTP connections on the same event loop."""
+    try:
+        await scheduler_flow.run_async(shared)
+    finally:
+        # On Ctrl-C the IDLE wait's worker thread is still running; asyncio.run
+        # waits for it before returning
+        stop_waiting()
+        await close_async_smtp()
+
+def main():
+    """Load the configuration and run the scheduler until interrupted."""
+    config_path = os.environ.get("SCHEDULER_CONFIG", "config.yaml")
+    with open(config_path) as f:
+        config = yaml.safe_load(f)
+    
+    shared = {"config": config}
+    try:
+        asyncio.run(run(shared))
+    finally:
+        close_smtp()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import pytest
+
+from utils import calendar_cache
+
+@pytest.fixture(autouse=True)
+def local_cache(monkeypatch):
+    monkeypatch.setattr(calendar_cache, "_local_cache", {})
+    monkeypatch.setattr(calendar_cache, "_get_redis", lambda: None)
+
+def counting(policy="normal", fail=False):
+    calls = []
+    @calendar_cache.calendar_cached(policy)
+    def busy(calendar_id, day):
+        calls.append((calendar_id, day))
+        if fail and len(calls) > 1:
+            raise ConnectionError("Calendar API down")
+        return [day]
+    return busy, calls
+
+def expire(seconds):
+    """Age every local entry by the given number of seconds."""
+    cache = calendar_cache._local_cache
+    for key, (fetched_at, value) in cache.items():
+        cache[key] = (fetched_at - seconds, value)
+
+def test_results_are_reused_per_arguments():
+    busy, calls = counting()
+    assert busy("primary", 1) == [1]
+    assert busy("primary", 1) == [1]
+    assert busy("primary", 2) == [2]
+    assert calls == [("primary", 1), ("primary", 2)]
+
+def test_cache_clear_forces_a_fresh_call():
+    busy, calls = counting()
+    busy("primary", 1)
+    busy.cache_clear()
+    busy("primary", 1)
+    assert len(calls) == 2
+
+def test_long_policy_serves_recently_expired_entry_on_error():
+    busy, calls = counting("long", fail=True)
+    busy("primary", 1)
+    expire(calendar_cache.CACHE_POLICIES["long"] + 1)
+    assert busy("primary", 1) == [1]
+    expire(calendar_cache.STALE_TTL)
+    with pytest.raises(ConnectionError):
+        busy("primary", 1)
+
+def test_normal_policy_raises_instead_of_serving_stale():
+    busy, calls = counting("normal", fail=True)
+    busy("primary", 1)
+    expire(calendar_cache.CACHE_POLICIES["normal"] + 1)
+    with pytest.raises(ConnectionError):
+        busy("primary", 1)
+    assert len(calls) == 2
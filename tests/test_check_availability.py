@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils import calendar_cache
+from utils import check_availability as availability
+from utils import schedule_meeting
+
+ET = availability.TIMEZONE
+HOUR = timedelta(hours=1)
+HALF_HOUR = timedelta(minutes=30)
+
+@pytest.fixture(autouse=True)
+def local_cache(monkeypatch):
+    monkeypatch.setattr(calendar_cache, "_local_cache", {})
+    monkeypatch.setattr(calendar_cache, "_get_redis", lambda: None)
+
+def et(day, hour, minute=0):
+    return datetime(2026, 10, day, hour, minute, tzinfo=ET)
+
+def test_working_windows_clip_each_weekday():
+    # Friday 16 Oct 13:00 to Tuesday 20 Oct 11:00; the weekend is skipped
+    windows = availability._working_windows(et(16, 13), et(20, 11), (9, 17))
+    assert windows == [(et(16, 13), et(16, 17)), (et(19, 9), et(19, 17)), (et(20, 9), et(20, 11))]
+
+def test_working_windows_outside_hours_are_empty():
+    assert availability._working_windows(et(19, 18), et(19, 23), (9, 17)) == []
+
+def test_free_slots_subtract_merged_busy_blocks():
+    windows = [(et(19, 9), et(19, 17)), (et(20, 9), et(20, 17))]
+    busy = [
+        (et(19, 10), et(19, 11)),
+        (et(19, 10, 30), et(19, 12)),     # overlaps the one before
+        (et(19, 12, 10), et(19, 13)),     # leaves a 10-minute gap
+        (et(19, 16), et(20, 10)),         # spans the night into the next window
+    ]
+    assert availability._free_slots(windows, busy, HALF_HOUR) == [
+        (et(19, 9), et(19, 10)),
+        (et(19, 13), et(19, 16)),
+        (et(20, 10), et(20, 17)),
+    ]
+
+def test_free_slots_drop_windows_shorter_than_the_meeting():
+    windows = [(et(19, 9), et(19, 17))]
+    busy = [(et(19, 9, 45), et(19, 16, 30))]
+    assert availability._free_slots(windows, busy, HOUR) == []
+    assert availability._free_slots(windows, busy, HALF_HOUR) == [(et(19, 9), et(19, 9, 45)), (et(19, 16, 30), et(19, 17))]
+
+class FakeService:
+    """freeBusy answering for the calendars in 'busy', recording each query."""
+    def __init__(self, busy):
+        self.busy = busy
+        self.queries = []
+
+    def freebusy(self):
+        return self
+
+    def query(self, body):
+        self.queries.append(body)
+        self.body = body
+        return self
+
+    def execute(self):
+        return {"calendars": {
+            item["id"]: {"busy": [{"start": s.isoformat(), "end": e.isoformat()} for s, e in self.busy.get(item["id"], [])]}
+            for item in self.body["items"]
+        }}
+
+def test_busy_times_come_from_the_booking_calendar(monkeypatch):
+    # The calendar schedule_meeting books on is the one freeBusy reads
+    assert availability.get_calendar_service is schedule_meeting.get_calendar_service
+    service = FakeService({"primary": [(et(19, 10), et(19, 15))]})
+    monkeypatch.setattr(availability, "get_calendar_service", lambda: service)
+
+    slots = availability.check_availability(datetime(2026, 10, 19, 9), datetime(2026, 10, 19, 17))
+    assert slots == [(datetime(2026, 10, 19, 9), datetime(2026, 10, 19, 10)),
+                     (datetime(2026, 10, 19, 15), datetime(2026, 10, 19, 17))]
+    assert [q["items"] for q in service.queries] == [[{"id": "primary"}]]
+
+def test_booked_slot_is_not_offered_after_clearing_the_cache(monkeypatch):
+    service = FakeService({})
+    monkeypatch.setattr(availability, "get_calendar_service", lambda: service)
+    start, end = et(19, 9), et(19, 17)
+    assert availability.check_availability(start, end) == [(start, end)]
+
+    service.busy["primary"] = [(et(19, 9), et(19, 17))]
+    availability.clear_busy_cache()
+    assert availability.check_availability(start, end) == []
@@ -0,0 +1,209 @@
+import asyncio
+import imaplib
+import socket
+import threading
+import time
+
+import pytest
+
+from utils import check_unread_emails as imap
+
+class FakeConn:
+    """The parts of imaplib.IMAP4 that _idle uses, over a socketpair."""
+    def __init__(self, sock):
+        self.sock = sock
+        self.file = sock.makefile("rb")
+    
+    def send(self, data):
+        self.sock.sendall(data)
+    
+    def readline(self):
+        return self.file.readline()
+
+def serve_idle(server, idle_reply):
+    f = server.makefile("rb")
+    tag, command = f.readline().split()
+    assert command == b"IDLE"
+    server.sendall(idle_reply)
+    assert f.readline() == b"DONE\r\n"
+    server.sendall(tag + b" OK IDLE terminated\r\n")
+
+def run_idle(idle_reply, timeout):
+    client, server = socket.socketpair()
+    threading.Thread(target=serve_idle, args=(server, idle_reply), daemon=True).start()
+    started = time.monotonic()
+    try:
+        return imap._idle(FakeConn(client), timeout), time.monotonic() - started
+    finally:
+        client.close()
+        server.close()
+
+def test_idle_sees_exists_buffered_with_continuation():
+    # Both lines arrive in one read, so EXISTS is already in conn.file's buffer
+    new_mail, elapsed = run_idle(b"+ idling\r\n* 3 EXISTS\r\n", timeout=5)
+    assert new_mail
+    assert elapsed < 1
+
+def test_idle_times_out_without_new_mail():
+    new_mail, elapsed = run_idle(b"+ idling\r\n", timeout=0.3)
+    assert not new_mail
+    assert elapsed >= 0.3
+
+def test_idle_returns_soon_after_stop_waiting(monkeypatch):
+    monkeypatch.setattr(imap, "_stop_waiting", threading.Event())
+    monkeypatch.setattr(imap, "STOP_CHECK_INTERVAL", 0.1)
+    threading.Timer(0.2, imap.stop_waiting).start()
+    new_mail, elapsed = run_idle(b"+ idling\r\n", timeout=30)
+    assert not new_mail
+    assert elapsed < 2
+
+class FakeIMAPServer:
+    """
+    Plain-text IMAP server on localhost, enough for login and SEARCH/SORT.
+
+    Like Gmail, it advertises SORT and IDLE only after LOGIN. A silent
+    server greets, then never answers a command.
+    """
+    def __init__(self, silent=False):
+        self.silent = silent
+        self.commands = []
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self.accept, daemon=True).start()
+    
+    def accept(self):
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.serve, args=(client,), daemon=True).start()
+    
+    def serve(self, client):
+        f = client.makefile("rwb")
+        f.write(b"* OK [CAPABILITY IMAP4rev1 AUTH=PLAIN] ready\r\n")
+        f.flush()
+        logged_in = False
+        for line in f:
+            tag, command = line.rstrip().split(b" ", 1)
+            self.commands.append(command)
+            if self.silent:
+                continue
+            name = command.split()[0].upper()
+            if name == b"CAPABILITY":
+                f.write(b"* CAPABILITY IMAP4rev1 " + (b"SORT IDLE" if logged_in else b"AUTH=PLAIN") + b"\r\n")
+            elif name == b"LOGIN":
+                logged_in = True
+            elif name == b"IDLE":
+                f.write(b"+ idling\r\n")
+                f.flush()
+                assert f.readline() == b"DONE\r\n"
+            elif name == b"SELECT":
+                f.write(b"* 0 EXISTS\r\n")
+            elif name == b"UID":
+                f.write(b"* " + command.split()[1].upper() + b"\r\n")
+            elif name == b"LOGOUT":
+                f.write(b"* BYE\r\n" + tag + b" OK\r\n")
+                f.flush()
+                return
+            f.write(tag + b" OK done\r\n")
+            f.flush()
+    
+    def close(self):
+        self.listener.close()
+
+@pytest.fixture
+def imap_server(monkeypatch):
+    servers = []
+    def start(**kwargs):
+        servers.append(FakeIMAPServer(**kwargs))
+        monkeypatch.setattr(imap, "IMAP_PORT", servers[-1].port)
+        return servers[-1]
+    monkeypatch.setattr(imap.imaplib, "IMAP4_SSL", imaplib.IMAP4)
+    monkeypatch.setattr(imap, "IMAP_SERVER", "127.0.0.1")
+    monkeypatch.setattr(imap, "_IMAP_POOL", {})
+    yield start
+    for server in servers:
+        server.close()
+
+def test_capabilities_are_read_after_login(imap_server):
+    server = imap_server()
+    emails, ack = imap.check_unread_emails("bot@x.com", "secret")
+    assert emails == []
+    conn = imap._IMAP_POOL[(imap.IMAP_SERVER, "bot@x.com")]
+    assert {"SORT", "IDLE"} <= set(conn.capabilities)
+    assert any(c.startswith(b"UID SORT") for c in server.commands)
+    imap._close(conn)
+
+def test_idle_between_imaplib_commands(imap_server):
+    # _idle's own tags and reads leave imaplib's state intact
+    imap_server()
+    conn = imap.connect("bot@x.com", "secret")
+    assert imap.wait_for_new_mail(timeout=0.2, conn=conn) is False
+    assert imap.wait_for_new_mail(timeout=0.2, conn=conn) is False
+    assert conn.noop()[0] == "OK"
+    assert conn.capability() == ("OK", [b"IMAP4rev1 SORT IDLE"])
+    imap._close(conn)
+
+def test_login_times_out_on_silent_server(imap_server, monkeypatch):
+    imap_server(silent=True)
+    monkeypatch.setattr(imap, "IMAP_TIMEOUT", 0.2)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        imap._login("bot@x.com", "secret")
+    assert time.monotonic() - started < 5
+
+@pytest.mark.parametrize("uids, sets", [
+    ([b"5"], ["5"]),
+    ([b"3", b"4", b"5", b"6", b"7", b"9"], ["3:7,9"]),
+    ([b"14", b"3", b"12", b"13", b"9"], ["3,9,12:14"]),
+])
+def test_uid_sets_compress_ranges(uids, sets):
+    assert imap._uid_sets(uids) == sets
+
+def test_uid_sets_split_only_past_the_line_limit(monkeypatch):
+    monkeypatch.setattr(imap, "MAX_UID_SET_LEN", 10)
+    uids = [str(n).encode() for n in (1, 2, 3, 10, 20, 30, 40, 41)]
+    sets = imap._uid_sets(uids)
+    assert sets == ["1:3,10,20", "30,40:41"]
+    assert all(len(s) <= 10 for s in sets)
+
+def test_many_checks_accounts_concurrently(imap_server, monkeypatch):
+    imap_server()
+    fast_done = threading.Event()
+    login, check = imap._login, imap.check_unread_emails
+    def held_login(username, password):
+        if username == "slow@x.com":
+            # Held until the other account is checked, which needs the pool meanwhile
+            assert fast_done.wait(5)
+        return login(username, password)
+    def checked(username, password):
+        result = check(username, password)
+        if username == "fast@x.com":
+            fast_done.set()
+        return result
+    monkeypatch.setattr(imap, "_login", held_login)
+    monkeypatch.setattr(imap, "check_unread_emails", checked)
+    results = asyncio.run(imap.check_unread_emails_many([("slow@x.com", "a"), ("fast@x.com", "b")]))
+    assert [emails for emails, ack in results] == [[], []]
+    assert sorted(user for server, user in imap._IMAP_POOL) == ["fast@x.com", "slow@x.com"]
+    for conn in imap._IMAP_POOL.values():
+        imap._close(conn)
+
+@pytest.mark.parametrize("header, addrs", [
+    ("", []),
+    ("a@x.com", ["a@x.com"]),
+    ("Alice <Alice@X.com>, b@y.org", ["alice@x.com", "b@y.org"]),
+    ("a@x.com, Again <A@x.com>", ["a@x.com"]),
+    # Quoted names, comments and groups go through getaddresses
+    ('"evil@x.com" <real@y.com>', ["real@y.com"]),
+    ("a@x.com (Alice)", ["a@x.com"]),
+    ("team: a@x.com, b@x.com;", ["a@x.com", "b@x.com"]),
+])
+def test_parse_email_addresses(header, addrs):
+    assert imap.parse_email_addresses(header) == addrs
+
+def test_plain_headers_take_the_regex_path(monkeypatch):
+    # Would raise if the full parser were called
+    monkeypatch.setattr(imap, "getaddresses", None)
+    assert imap.parse_email_addresses("Alice <a@x.com>, b@y.org") == ["a@x.com", "b@y.org"]
@@ -0,0 +1,242 @@
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+import flow
+from utils.check_unread_emails import Email
+
+TODAY = datetime(2026, 10, 15, 14, 37)
+
+def decide(body, slots=((datetime(2026, 10, 20, 9), datetime(2026, 10, 20, 17)),)):
+    pytest.importorskip("dateparser")
+    return flow.ActionDeciderNode.decide_without_llm({
+        "email_body": body,
+        "today": TODAY,
+        "meeting": {
+            "duration": 30,
+            "timeframe": {"start": datetime(2026, 10, 15), "end": datetime(2026, 10, 30)}
+        },
+        "available_slots": list(slots)
+    })
+
+@pytest.mark.parametrize("body", [
+    "Let's meet next week to discuss the roadmap.",
+    "Can we meet Tuesday?",
+    "Are you around on October 20?",
+])
+def test_decide_without_llm_defers_dates_without_clock_time(body):
+    # dateparser gives these the current time of day; they must not be booked
+    assert decide(body) is None
+
+def test_decide_without_llm_schedules_explicit_time_in_one_slot():
+    result = decide("Can we meet on October 20 at 2pm?")
+    assert result["action"] == "schedule"
+    assert result["chosen_slot"] == (datetime(2026, 10, 20, 14), datetime(2026, 10, 20, 14, 30))
+
+def test_decide_without_llm_accepts_24h_time():
+    result = decide("October 20, 14:00 works for me")
+    assert result["chosen_slot"][0] == datetime(2026, 10, 20, 14)
+
+def test_decide_without_llm_defers_time_outside_slots():
+    assert decide("Can we meet on October 20 at 7pm?") is None
+
+def test_decide_without_llm_asks_when_no_dates():
+    assert decide("Hi, let's catch up.")["action"] == "ask_time"
+
+@pytest.mark.parametrize("response, yaml_str", [
+    ("Sure.\n```yaml\naction: schedule\n```\nDone.", "action: schedule"),
+    # Only the first fence; an unclosed one runs to the end like the old split
+    ("```yaml\na: 1\n```\n```yaml\nb: 2\n```", "a: 1"),
+    ("```yaml\na: 1\nb: 2", "a: 1\nb: 2"),
+])
+def test_extract_yaml(response, yaml_str):
+    assert flow.extract_yaml(response) == yaml_str
+
+def test_extract_yaml_without_fence_names_the_problem():
+    with pytest.raises(ValueError, match="no ```yaml fenced block"):
+        flow.extract_yaml("action: schedule")
+
+def test_parse_et():
+    assert flow.parse_et(" 2026-10-20 9:05 ET ") == datetime(2026, 10, 20, 9, 5)
+
+def test_parse_slot():
+    assert flow.parse_slot("2026-10-20 14:00 ET to 14:30 ET") == (datetime(2026, 10, 20, 14), datetime(2026, 10, 20, 14, 30))
+
+@pytest.mark.parametrize("parse, value", [
+    (flow.parse_et, "2026-10-20 14:00"),
+    (flow.parse_et, "2026-10-20 14:00 ET extra"),
+    (flow.parse_et, "Oct 20 2pm"),
+    (flow.parse_et, "2026-13-20 14:00 ET"),
+    (flow.parse_slot, "2026-10-20 14:00 ET"),
+    (flow.parse_slot, "2026-10-20 14:00 ET - 14:30 ET"),
+])
+def test_parse_rejects_other_formats(parse, value):
+    with pytest.raises(ValueError):
+        parse(value)
+
+def test_batch_contains_per_email_failures(monkeypatch):
+    class Email:
+        subject = "Meeting"
+    pending = {"bad": {"email": Email()}, "good": {"email": Email(), "stage": "drafted"}}
+    async def orch(self, shared, params=None):
+        if params["email_id"] == "bad":
+            raise RuntimeError("boom")
+        del shared["pending_emails"][params["email_id"]]
+    unread = []
+    monkeypatch.setattr(flow.AsyncParallelBatchFlow, "_orch_async", orch)
+    monkeypatch.setattr(flow, "mark_unread", lambda emails, username, password: unread.extend(emails))
+    batch = flow.EmailAnalysisBatchFlow(start=flow.ResumeRouterNode())
+    shared = {"pending_emails": pending, "config": {"email": {"username": "bot@x.com", "password": "x"}}}
+    for attempt in range(1, flow.MAX_EMAIL_ATTEMPTS):
+        asyncio.run(batch._run_async(shared))
+        # The good email still finished; the bad one records its failures
+        assert list(pending) == ["bad"]
+        assert pending["bad"]["attempts"] == attempt
+        assert pending["bad"]["error"] == "new: RuntimeError('boom')"
+        # Backing off: not retried until next_attempt_at
+        delay = pending["bad"]["next_attempt_at"] - time.time()
+        assert flow.RETRY_BACKOFF * 2 ** (attempt - 1) - 5 < delay <= flow.RETRY_BACKOFF * 2 ** (attempt - 1)
+        asyncio.run(batch._run_async(shared))
+        assert pending["bad"]["attempts"] == attempt
+        pending["bad"] = {**pending["bad"], "next_attempt_at": 0}
+    asyncio.run(batch._run_async(shared))
+    # Given up on: left unread and kept so it is not fetched again
+    assert pending["bad"]["failed"] is True
+    assert unread == [pending["bad"]["email"]]
+    assert not flow.is_due(pending["bad"], time.time())
+
+def test_fetcher_waits_for_backoff_and_skips_failed_emails(monkeypatch):
+    now = time.time()
+    pending = {"<retry@x>": {"next_attempt_at": now + 40}, "<failed@x>": {"failed": True}}
+    shared = {"pending_emails": pending, "config": {
+        "email": {"username": "bot@x.com", "password": "x"}, "authorized_user": "boss@x.com"
+    }}
+    waits = []
+    def fake_idle(username, password, timeout, skip):
+        waits.append((timeout, skip))
+        return [], None
+    monkeypatch.setattr(flow, "idle_wait_for_unread", fake_idle)
+    node = flow.EmailFetcherNode()
+    prep = asyncio.run(node.prep_async(shared))
+    assert asyncio.run(node.exec_async(prep)) is None
+    # Nothing due: IDLE only until the backed-off email may run again
+    [(timeout, skip)] = waits
+    assert 35 < timeout <= 40
+    assert skip == {"<failed@x>"}
+    assert asyncio.run(node.post_async(shared, prep, None)) == "monitor"
+
+def test_sender_keeps_bcc_attendees_hidden(monkeypatch):
+    sent = []
+    async def fake_send(**kwargs):
+        sent.append(kwargs)
+    monkeypatch.setattr(flow, "send_email_async", fake_send)
+    inputs = {
+        "draft": {"subject": "Roadmap", "body": "See you then"},
+        "meeting": {"attendees": ["boss@x.com", "Hidden <Hidden@x.com>", "cc@x.com"]},
+        "bcc_addrs": frozenset({"hidden@x.com"}),
+        "email_config": {"username": "bot@x.com", "password": "x"},
+        "threading": {"message_id": "<m1@x>", "references": []}
+    }
+    asyncio.run(flow.EmailSenderNode().exec_async(inputs))
+    [kwargs] = sent
+    assert kwargs["to_emails"] == ["boss@x.com", "cc@x.com"]
+    assert kwargs["bcc_emails"] == ["Hidden <Hidden@x.com>"]
+
+def test_draft_nodes_must_build_a_prompt():
+    with pytest.raises(TypeError):
+        flow.DraftEmailNode()
+    for node in (flow.schedule_confirmation, flow.time_proposal, flow.no_slots):
+        assert isinstance(node, flow.DraftEmailNode)
+        assert node.template_name
+
+@pytest.mark.parametrize("text, scheduling", [
+    ("Are you free Tuesday at 2?", True),
+    ("Can we hop on a call Thursday?", True),
+    ("Quick sync next week?", True),
+    ("What time works for you?", True),
+    ("Does Oct 20 at 3pm work?", True),
+    ("Can we reschedule?", True),
+    ("Let's meet to go over the roadmap", True),
+    ("Please share your availability", True),
+    ("Could you do this afternoon?", True),
+    ("Any chance for 10:30 tomorrow?", True),
+    ("Your order has shipped", False),
+    ("Thanks for the report", False),
+    # Words the wider list matched without any scheduling context
+    ("When will the report be ready?", False),
+    ("Feel free to reach out with questions", False),
+    ("Thanks for the call notes", False),
+    ("Time to renew your subscription", False),
+    ("Good morning team, the build is green", False),
+])
+def test_scheduling_prefilter(text, scheduling):
+    assert bool(flow._SCHED_RE.search(text)) is scheduling
+
+def make_email(message_id, subject, body):
+    return Email(
+        sender="Boss <boss@x.com>", sender_addr="boss@x.com", to=("bot@x.com",), cc=(),
+        cc_addrs=frozenset(), bcc=(), bcc_addrs=frozenset(), subject=subject, timestamp=0.0,
+        message_id=message_id, in_reply_to=None, references=(), reply_to=None, _body=body
+    )
+
+SLOT = (datetime(2026, 10, 20, 14), datetime(2026, 10, 20, 14, 30))
+MEETING = {
+    "duration": 30, "description": "Roadmap", "reason": "next week", "attendees": ["boss@x.com"],
+    "location": "", "timeframe": {"start": datetime(2026, 10, 19, 9), "end": datetime(2026, 10, 23, 17)}
+}
+EVENT = {"id": "e1", "htmlLink": "https://calendar/e1",
+         "start": {"dateTime": "2026-10-20T14:00:00-04:00"}, "end": {"dateTime": "2026-10-20T14:30:00-04:00"}}
+
+def test_batch_resumes_each_email_after_its_last_stage(monkeypatch):
+    calls = []
+    async def fake_llm(prompt, **kwargs):
+        if "First determine if this email is about scheduling" in prompt:
+            calls.append("classify")
+            return ("```yaml\nis_scheduling: true\nreason: next week\nduration: 30\ntimeframe:\n"
+                    "  start: 2026-10-19 09:00 ET\n  end: 2026-10-23 17:00 ET\ndescription: Roadmap\n```")
+        calls.append("decide")
+        return "```yaml\naction: schedule\nreason: fits\nchosen_slot: 2026-10-20 14:00 ET to 14:30 ET\n```"
+    def fake_availability(**kwargs):
+        calls.append("availability")
+        return [SLOT]
+    def fake_schedule(details):
+        calls.append("schedule")
+        return EVENT
+    async def fake_send(subject, **kwargs):
+        calls.append(("send", subject))
+    monkeypatch.setattr(flow, "call_llm_async", fake_llm)
+    monkeypatch.setattr(flow, "search_dates", None)
+    monkeypatch.setattr(flow, "check_availability", fake_availability)
+    monkeypatch.setattr(flow, "schedule_meeting", fake_schedule)
+    monkeypatch.setattr(flow, "clear_busy_cache", lambda: None)
+    monkeypatch.setattr(flow, "send_email_async", fake_send)
+    
+    def request(**extra):
+        return {"status": "pending", "meeting": dict(MEETING), "available_slots": [SLOT], "chosen_slot": None, **extra}
+    pending = {
+        "<new@x>": {"email": make_email("<new@x>", "New", "Can we meet next week?")},
+        "<checked@x>": {"email": make_email("<checked@x>", "Checked", "Meet next week?"),
+                        "stage": "checked", "request": request()},
+        "<scheduled@x>": {"email": make_email("<scheduled@x>", "Scheduled", "Meet?"),
+                          "stage": "scheduled", "request": request(chosen_slot=SLOT, event=EVENT)},
+        "<drafted@x>": {"email": make_email("<drafted@x>", "Drafted", "Meet?"),
+                        "stage": "drafted", "request": request(),
+                        "draft_email": {"subject": "Drafted", "body": "See you then"}},
+    }
+    shared = {
+        "pending_emails": pending,
+        "_timeframe_ctx": flow.build_timeframe_ctx(TODAY),
+        "config": {"authorized_user": "boss@x.com", "email": {"username": "bot@x.com", "password": "x"},
+                   "calendar": {"working_hours": {"start": 9, "end": 17}}}
+    }
+    asyncio.run(flow.email_analysis._run_async(shared))
+    
+    assert pending == {}
+    # Completed stages are not repeated: one classification and one availability
+    # check (the new email), two decisions, two bookings, and every email sent once
+    assert sorted(c for c in calls if isinstance(c, str)) == [
+        "availability", "classify", "decide", "decide", "schedule", "schedule"
+    ]
+    assert sorted(c[1] for c in calls if isinstance(c, tuple)) == ["Checked", "Drafted", "New", "Scheduled"]
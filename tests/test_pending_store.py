@@ -0,0 +1,34 @@
+from utils import pending_store
+from utils.check_unread_emails import Email
+
+def make_email(subject):
+    return Email(
+        sender="Boss <boss@x.com>", sender_addr="boss@x.com", to=("bot@x.com",), cc=(),
+        cc_addrs=frozenset(), bcc=(), bcc_addrs=frozenset(), subject=subject, timestamp=0.0,
+        message_id="<m1@x>", in_reply_to=None, references=(), reply_to=None, _body="Can we meet?"
+    )
+
+def test_entries_round_trip(tmp_path):
+    store = pending_store.PendingStore(str(tmp_path / "pending.sqlite3"))
+    store["<m1@x>"] = {"email": make_email("Sync"), "stage": "checked"}
+    reopened = pending_store.PendingStore(store.path)
+    entry = reopened["<m1@x>"]
+    assert entry["stage"] == "checked"
+    assert entry["email"].subject == "Sync"
+    assert entry["email"].body == "Can we meet?"
+    store.close()
+    reopened.close()
+
+def test_main_lists_stage_and_subject(tmp_path, capsys):
+    path = str(tmp_path / "pending.sqlite3")
+    store = pending_store.PendingStore(path)
+    store["<m1@x>"] = {"email": make_email("Sync")}
+    store["<m2@x>"] = {"email": make_email(""), "stage": "drafted"}
+    store["<m3@x>"] = {"email": make_email("Stuck"), "stage": "checked", "failed": True}
+    store.close()
+    pending_store.main(path)
+    assert capsys.readouterr().out.splitlines() == [
+        "<m1@x>: new - Sync",
+        "<m2@x>: drafted - No subject",
+        "<m3@x>: checked (failed) - Stuck",
+    ]
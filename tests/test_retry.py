@@ -0,0 +1,87 @@
+import asyncio
+import imaplib
+import smtplib
+
+import pytest
+from googleapiclient.errors import HttpError
+
+from utils import retry
+
+class Response(dict):
+    def __init__(self, status):
+        super().__init__()
+        self.status = status
+        self.reason = "Error"
+
+@pytest.fixture(autouse=True)
+def no_delay(monkeypatch):
+    monkeypatch.setattr(retry, "RETRY_BASE_DELAY", 0)
+
+def failing(*errors):
+    """A function raising the given errors in turn, then returning 'ok'."""
+    calls = []
+    @retry.retry_transient
+    def fn():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+    return fn, calls
+
+def failing_async(*errors):
+    calls = []
+    @retry.retry_transient
+    async def fn():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+    return fn, calls
+
+@pytest.mark.parametrize("exc, transient", [
+    (HttpError(Response(429), b"rate limited"), True),
+    (HttpError(Response(503), b"unavailable"), True),
+    (HttpError(Response(403), b"forbidden"), False),
+    (smtplib.SMTPServerDisconnected(), True),
+    (imaplib.IMAP4.abort("socket error"), True),
+    (ConnectionResetError(), True),
+    (TimeoutError(), True),
+    (smtplib.SMTPAuthenticationError(535, b"bad password"), False),
+    (ValueError(), False),
+])
+def test_is_transient(exc, transient):
+    assert retry.is_transient(exc) is transient
+
+def test_transient_errors_are_retried():
+    fn, calls = failing(ConnectionResetError(), TimeoutError())
+    assert fn() == "ok"
+    assert len(calls) == 3
+
+def test_other_errors_are_raised_at_once():
+    fn, calls = failing(ValueError("bad input"))
+    with pytest.raises(ValueError):
+        fn()
+    assert len(calls) == 1
+
+def test_gives_up_after_retry_attempts(monkeypatch):
+    monkeypatch.setattr(retry, "RETRY_ATTEMPTS", 3)
+    fn, calls = failing(*[TimeoutError(n) for n in range(5)])
+    with pytest.raises(TimeoutError) as raised:
+        fn()
+    assert raised.value.args == (2,)
+    assert len(calls) == 3
+
+def test_coroutines_are_retried_without_blocking_the_loop(monkeypatch):
+    def blocking_sleep(seconds):
+        raise AssertionError("time.sleep in a coroutine")
+    monkeypatch.setattr(retry.time, "sleep", blocking_sleep)
+    fn, calls = failing_async(ConnectionResetError())
+    assert asyncio.iscoroutinefunction(fn)
+    assert asyncio.run(fn()) == "ok"
+    assert len(calls) == 2
+
+def test_coroutines_raise_other_errors_at_once():
+    fn, calls = failing_async(ValueError("bad input"))
+    with pytest.raises(ValueError):
+        asyncio.run(fn())
+    assert len(calls) == 1
@@ -0,0 +1,63 @@
+from datetime import datetime
+
+import pytest
+from googleapiclient.errors import HttpError
+
+from utils import schedule_meeting as sm
+
+class Response(dict):
+    def __init__(self, status):
+        super().__init__()
+        self.status = status
+        self.reason = "Conflict"
+
+class Request:
+    def __init__(self, fn):
+        self.execute = fn
+
+class FakeEvents:
+    """Calendar events() resource keeping ids forever, as Calendar does."""
+    def __init__(self):
+        self.events = {}
+    
+    def insert(self, calendarId, body, sendUpdates):
+        def execute():
+            if body["id"] in self.events:
+                raise HttpError(Response(409), b"duplicate")
+            self.events[body["id"]] = dict(body, status="confirmed")
+            return self.events[body["id"]]
+        return Request(execute)
+    
+    def get(self, calendarId, eventId):
+        return Request(lambda: self.events[eventId])
+
+@pytest.fixture
+def calendar(monkeypatch):
+    events = FakeEvents()
+    service = type("Service", (), {"events": lambda self: events})()
+    monkeypatch.setattr(sm, "get_calendar_service", lambda: service)
+    monkeypatch.setattr(sm, "_get_redis", lambda: None)
+    monkeypatch.setattr(sm, "_local_events", {})
+    return events
+
+DETAILS = {
+    "title": "Sync",
+    "start_time": datetime(2026, 10, 20, 14),
+    "end_time": datetime(2026, 10, 20, 14, 30),
+    "attendees": ["boss@x.com"]
+}
+
+def test_identical_details_reuse_the_event_after_the_cache(calendar):
+    first = sm.schedule_meeting(DETAILS)
+    sm._local_events.clear()
+    assert sm.schedule_meeting(DETAILS)["id"] == first["id"]
+    assert len(calendar.events) == 1
+
+def test_cancelled_event_is_booked_again_under_a_new_id(calendar):
+    first = sm.schedule_meeting(DETAILS)
+    calendar.events[first["id"]]["status"] = "cancelled"
+    sm._local_events.clear()
+    second = sm.schedule_meeting(DETAILS)
+    assert second["status"] == "confirmed"
+    assert second["id"] != first["id"]
+    assert second["id"].startswith(first["id"])
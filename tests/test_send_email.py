@@ -0,0 +1,337 @@
+import asyncio
+import email
+import email.errors
+import email.policy
+import email.utils
+import re
+import smtplib
+import socket
+import threading
+import types
+
+import pytest
+
+from utils import retry
+from utils import send_email
+
+class FakeSMTPServer:
+    """
+    Plain-text SMTP server on localhost recording what clients send.
+
+    Each recv() is one entry in 'batches', so pipelined commands arrive
+    together while unpipelined ones arrive one per batch. Messages are
+    kept as received, dot-stuffing included.
+    """
+    def __init__(self, pipelining=True, reject=(), silent=False):
+        self.pipelining = pipelining
+        self.reject = set(reject)
+        self.silent = silent
+        self.batches = []
+        self.messages = []
+        self.connections = 0
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self.accept, daemon=True).start()
+
+    def accept(self):
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self.serve, args=(client,), daemon=True).start()
+
+    def serve(self, client):
+        with client:
+            if self.silent:
+                client.recv(1)
+                return
+            client.sendall(b"220 fake ESMTP\r\n")
+            buffer, data, recipients = b"", None, []
+            while True:
+                chunk = client.recv(65536)
+                if not chunk:
+                    return
+                buffer += chunk
+                batch = []
+                while True:
+                    if data is not None:
+                        end = buffer.find(b"\r\n.\r\n")
+                        if end < 0:
+                            break
+                        self.messages.append(buffer[:end + 2])
+                        buffer, data = buffer[end + 5:], None
+                        client.sendall(b"250 2.0.0 queued\r\n")
+                        continue
+                    if b"\r\n" not in buffer:
+                        break
+                    line, buffer = buffer.split(b"\r\n", 1)
+                    batch.append(line)
+                    reply = self.reply(line, recipients)
+                    if line.upper() == b"QUIT":
+                        # Recorded before the reply, which lets the client go on
+                        self.batches.append(batch)
+                        client.sendall(reply)
+                        return
+                    client.sendall(reply)
+                    if line.upper().startswith(b"DATA") and reply.startswith(b"354"):
+                        data = b""
+                if batch:
+                    self.batches.append(batch)
+
+    def reply(self, line, recipients):
+        verb = line.split(b" ", 1)[0].split(b":", 1)[0].upper()
+        if verb == b"EHLO":
+            return (b"250-fake greets you\r\n250-SIZE 35882577\r\n"
+                    + (b"250-PIPELINING\r\n" if self.pipelining else b"")
+                    + b"250 AUTH PLAIN LOGIN\r\n")
+        if verb == b"AUTH":
+            return b"235 2.7.0 Accepted\r\n"
+        if verb == b"MAIL":
+            recipients.clear()
+            return b"250 2.1.0 OK\r\n"
+        if verb == b"RCPT":
+            addr = line.split(b"<", 1)[1].split(b">", 1)[0].decode()
+            if addr in self.reject:
+                return b"550-5.1.1 The email account that you tried to reach\r\n550 5.1.1 does not exist.\r\n"
+            recipients.append(addr)
+            return b"250 2.1.5 OK\r\n"
+        if verb == b"DATA":
+            return b"354 Go ahead\r\n" if recipients else b"554 5.5.1 No valid recipients\r\n"
+        if verb == b"QUIT":
+            return b"221 2.0.0 closing\r\n"
+        return b"250 2.0.0 OK\r\n"
+
+    def commands(self):
+        return [line.split(b" ", 1)[0].split(b":", 1)[0].upper() for batch in self.batches for line in batch]
+
+    def close(self):
+        self.listener.close()
+
+MESSAGE = "Subject: Sync\r\n\r\nAgenda:\r\n.hidden line\r\n..two dots\r\n.\r\nend"
+# RFC 5321 4.5.2: a line starting with "." gets one more
+STUFFED = b"Subject: Sync\r\n\r\nAgenda:\r\n..hidden line\r\n...two dots\r\n..\r\nend\r\n"
+
+@pytest.fixture
+def smtp_server():
+    servers = []
+    def start(**kwargs):
+        servers.append(FakeSMTPServer(**kwargs))
+        return servers[-1]
+    yield start
+    for server in servers:
+        server.close()
+
+@pytest.fixture
+def plain_asyncio(monkeypatch):
+    """Connect AsyncSMTPSession without TLS, to the fake server."""
+    open_connection = asyncio.open_connection
+    monkeypatch.setattr(asyncio, "open_connection",
+                        lambda host, port, ssl=None: open_connection(host, port))
+
+@pytest.fixture
+def no_retry(monkeypatch):
+    monkeypatch.setattr(retry, "RETRY_ATTEMPTS", 1)
+
+def async_send(server, to_addrs, msg=MESSAGE, timeout=5):
+    async def main():
+        session = send_email.AsyncSMTPSession("bot@x.com", "secret", "127.0.0.1", server.port, timeout=timeout)
+        try:
+            return await session.sendmail("bot@x.com", to_addrs, msg)
+        finally:
+            await session.close()
+    return asyncio.run(main())
+
+def test_async_session_pipelines_the_envelope(smtp_server, plain_asyncio):
+    server = smtp_server()
+    assert async_send(server, ["a@x.com", "b@x.com"]) == {}
+    # The multi-line EHLO reply was read whole, so PIPELINING was seen
+    assert [b"MAIL FROM:<bot@x.com>", b"RCPT TO:<a@x.com>", b"RCPT TO:<b@x.com>", b"DATA"] in server.batches
+    assert server.messages == [STUFFED]
+
+def test_async_session_reports_rejected_recipient_in_batch(smtp_server, plain_asyncio):
+    server = smtp_server(reject={"gone@x.com"})
+    refused = async_send(server, ["a@x.com", "gone@x.com"])
+    # The multi-line 550 is one reply, so the DATA reply still lines up
+    assert refused == {"gone@x.com": (550, b"5.1.1 The email account that you tried to reach\n5.1.1 does not exist.")}
+    assert server.messages == [STUFFED]
+
+def test_async_session_all_recipients_rejected(smtp_server, plain_asyncio, no_retry):
+    server = smtp_server(reject={"gone@x.com"})
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        async_send(server, ["gone@x.com"])
+    assert server.messages == []
+    assert b"RSET" in server.commands()
+
+def test_async_session_times_out_on_silent_server(smtp_server, plain_asyncio, no_retry):
+    server = smtp_server(silent=True)
+    with pytest.raises(TimeoutError):
+        async_send(server, ["a@x.com"], timeout=0.2)
+
+class PlainPipeliningSMTP(send_email.PipeliningSMTP):
+    """PipeliningSMTP over plain TCP, to talk to the fake server."""
+    def _get_socket(self, host, port, timeout):
+        return socket.create_connection((host, port), timeout)
+
+def sync_send(server, to_addrs, msg=MESSAGE):
+    conn = PlainPipeliningSMTP("127.0.0.1", server.port, timeout=5)
+    try:
+        conn.login("bot@x.com", "secret")
+        return conn.sendmail("bot@x.com", to_addrs, msg)
+    finally:
+        conn.quit()
+
+def test_pipelining_smtp_sends_envelope_in_one_write(smtp_server):
+    server = smtp_server()
+    assert sync_send(server, ["a@x.com", "b@x.com"]) == {}
+    assert [b"MAIL FROM:<bot@x.com>", b"RCPT TO:<a@x.com>", b"RCPT TO:<b@x.com>", b"DATA"] in server.batches
+    assert server.messages == [STUFFED]
+
+def test_pipelining_smtp_falls_back_without_pipelining(smtp_server):
+    server = smtp_server(pipelining=False)
+    assert sync_send(server, ["a@x.com", "b@x.com"]) == {}
+    # smtplib's own sendmail: each command waited for the previous reply
+    assert all(len(batch) == 1 for batch in server.batches)
+    assert server.commands()[2:7] == [b"MAIL", b"RCPT", b"RCPT", b"DATA", b"QUIT"]
+    assert server.messages == [STUFFED]
+
+def test_pipelining_smtp_reports_refused_recipient(smtp_server):
+    server = smtp_server(reject={"gone@x.com"})
+    refused = sync_send(server, ["a@x.com", "gone@x.com", "b@x.com"])
+    assert list(refused) == ["gone@x.com"]
+    assert refused["gone@x.com"][0] == 550
+    assert server.messages == [STUFFED]
+
+def test_pipelining_smtp_all_recipients_refused(smtp_server):
+    server = smtp_server(reject={"gone@x.com"})
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        sync_send(server, ["gone@x.com"])
+    assert server.messages == []
+    assert b"RSET" in server.commands()
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Point the background senders' sessions at one fake server."""
+    server = FakeSMTPServer()
+    class ToFakeServer(send_email.PipeliningSMTP):
+        def _get_socket(self, host, port, timeout):
+            return socket.create_connection(("127.0.0.1", server.port), timeout)
+    monkeypatch.setattr(send_email, "PipeliningSMTP", ToFakeServer)
+    monkeypatch.setattr(send_email, "_session_stacks", {})
+    yield server
+    send_email.close_all()
+    server.close()
+
+def queued_message(n, to="a@x.com", **extra):
+    return {"subject": f"Sync {n}", "body": "See you then.", "to_emails": [to],
+            "from_email": "bot@x.com", "app_password": "secret", **extra}
+
+def test_send_email_bulk_sends_over_several_connections(queued):
+    results = send_email.send_email_bulk([queued_message(n) for n in range(8)])
+    assert [r["subject"] for r in results] == [f"Sync {n}" for n in range(8)]
+    assert len(queued.messages) == 8
+    # Each worker checks out its own session, so at most SMTP_WORKERS connections
+    assert 1 <= queued.connections <= send_email.SMTP_WORKERS
+
+def test_enqueue_email_accepts_smtp_none(queued):
+    result = send_email.enqueue_email(**queued_message(1, smtp=None)).result(timeout=10)
+    assert result["to"] == ["a@x.com"]
+    assert len(queued.messages) == 1
+
+def test_enqueued_failure_is_raised_by_the_future(queued, no_retry):
+    queued.reject.add("gone@x.com")
+    future = send_email.enqueue_email(**queued_message(1, to="gone@x.com"))
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        future.result(timeout=10)
+    # The session went back on the stack for the next email
+    assert send_email.enqueue_email(**queued_message(2)).result(timeout=10)["subject"] == "Sync 2"
+
+def test_close_all_waits_for_queued_emails(queued):
+    futures = [send_email.enqueue_email(**queued_message(n)) for n in range(3)]
+    send_email.close_all()
+    assert all(f.done() for f in futures)
+    assert len(queued.messages) == 3
+    assert send_email._session_stacks == {}
+    assert queued.commands().count(b"QUIT") == queued.connections
+
+def build(subject="Sync", body="Tuesday at 2pm works.\nSee you then."):
+    recipients, raw, result = send_email._build_email(
+        subject, body, ["a@x.com", "B <b@x.com>"], "bot@x.com", "Scheduler",
+        "<m1@x>", "<m0@x>"
+    )
+    return raw, email.message_from_string(raw, policy=email.policy.default)
+
+def test_plain_ascii_message_uses_the_template():
+    raw, msg = build()
+    assert raw.startswith('From: Scheduler <bot@x.com>\r\nTo: a@x.com,\r\n B <b@x.com>\r\nSubject: Re: Sync\r\n')
+    assert msg["Content-Transfer-Encoding"] == "7bit"
+    assert msg["In-Reply-To"] == "<m1@x>"
+    assert msg["References"] == "<m0@x> <m1@x>"
+    assert raw.endswith("7bit\r\n\r\nTuesday at 2pm works.\r\nSee you then.")
+
+@pytest.mark.parametrize("subject, body", [
+    ("Café sync", "See you then."),
+    ("Sync", "Rendez-vous au café."),
+    ("Sync", "x" * (send_email.MAX_LINE + 1)),
+])
+def test_other_messages_fall_back_to_mimetext(subject, body):
+    raw, msg = build(subject, body)
+    assert "Content-Transfer-Encoding: 7bit" not in raw
+    assert msg["Content-Transfer-Encoding"] == "base64"
+    assert msg["Subject"] == f"Re: {subject}"
+    assert msg.get_content().rstrip("\n") == body
+    assert msg["References"] == "<m0@x> <m1@x>"
+
+def test_header_with_line_break_is_refused():
+    # Not filled into the template, where it would add a Bcc header
+    with pytest.raises(email.errors.HeaderParseError):
+        build("Sync\r\nBcc: evil@x.com")
+
+def test_msgids_are_unique_and_resolve_the_hostname_once(monkeypatch):
+    lookups = []
+    def getfqdn():
+        lookups.append(1)
+        return "host.example"
+    monkeypatch.setattr(send_email.socket, "getfqdn", getfqdn)
+    send_email._local_hostname.cache_clear()
+    try:
+        ids = [send_email._make_msgid() for _ in range(3)]
+    finally:
+        send_email._local_hostname.cache_clear()
+    assert len(set(ids)) == 3
+    assert all(re.fullmatch(r"<[0-9a-f]+\.[0-9a-f]+@host\.example>", i) for i in ids)
+    assert lookups == [1]
+
+def test_date_header_is_formatted_once_per_second(monkeypatch):
+    clock = iter([1760000000.2, 1760000000.9, 1760000001.1])
+    monkeypatch.setattr(send_email, "time", types.SimpleNamespace(time=lambda: next(clock)))
+    monkeypatch.setattr(send_email, "_date_cache", (0, ""))
+    formatted = []
+    def formatdate(timeval, localtime):
+        formatted.append(timeval)
+        return email.utils.formatdate(timeval, localtime=localtime)
+    monkeypatch.setattr(send_email, "formatdate", formatdate)
+    first, second, third = (send_email._date_header() for _ in range(3))
+    assert first == second != third
+    assert formatted == [1760000000, 1760000001]
+    assert email.utils.parsedate_to_datetime(third).timestamp() == 1760000001
+
+@pytest.mark.parametrize("subject", ["Sync", "Café sync"])
+def test_bcc_recipients_are_envelope_only(subject):
+    recipients, raw, result = send_email._build_email(
+        subject, "See you then.", ["a@x.com"], "bot@x.com", "Scheduler", None, None,
+        ["Hidden <h@x.com>", "A@x.com"]
+    )
+    # Already in To: once is enough
+    assert recipients == ["a@x.com", "h@x.com"]
+    assert "h@x.com" not in raw
+    assert (result["to"], result["bcc"]) == (["a@x.com"], ["h@x.com"])
+
+def test_bcc_only_message_has_undisclosed_to():
+    recipients, raw, result = send_email._build_email(
+        "Sync", "See you then.", [], "bot@x.com", "Scheduler", None, None, ["h@x.com"]
+    )
+    assert recipients == ["h@x.com"]
+    assert "\r\nTo: undisclosed-recipients:;\r\n" in raw
+    assert "h@x.com" not in raw
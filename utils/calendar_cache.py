@@ -0,0 +1,125 @@
+import functools
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+try:
+    # Optional: shares cached reads between processes
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached Calendar read is served without calling the API
+CACHE_POLICIES = {"short": 5, "normal": 30, "long": 300}
+# Only these policies answer from an expired entry when the Calendar API
+# fails, and only within STALE_TTL seconds of its expiry. Short and normal
+# reads feed decisions (free slots before a booking), so they raise instead
+STALE_POLICIES = {"long"}
+STALE_TTL = 600
+CACHE_SIZE = 512
+REDIS_URL = os.environ.get("REDIS_URL")
+
+_redis_client = None
+# key -> (fetched_at, value), oldest insertion first
+_local_cache = {}
+_local_cache_lock = threading.Lock()
+
+def _get_redis():
+    global _redis_client
+    if _redis_client is None and redis is not None and REDIS_URL:
+        _redis_client = redis.Redis.from_url(REDIS_URL)
+    return _redis_client
+
+def _key_prefix(fn: Callable) -> str:
+    return f"gcal:{fn.__qualname__}:"
+
+def _cache_key(fn: Callable, args: tuple, kwargs: dict) -> str:
+    canonical = repr((args, sorted(kwargs.items())))
+    return _key_prefix(fn) + hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+def _lookup(key: str, max_age: int) -> Optional[Tuple[float, object]]:
+    client = _get_redis()
+    if client is not None:
+        try:
+            cached = client.get(key)
+            if cached is not None:
+                entry = pickle.loads(cached)
+                return entry if time.time() - entry[0] < max_age else None
+        except redis.RedisError as e:
+            logger.warning(f"Redis lookup failed, using local cache: {e}")
+    with _local_cache_lock:
+        entry = _local_cache.get(key)
+    if entry and time.time() - entry[0] < max_age:
+        return entry
+    return None
+
+def _store(key: str, entry: Tuple[float, object], max_age: int):
+    client = _get_redis()
+    if client is not None:
+        try:
+            client.setex(key, max_age, pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+        except redis.RedisError as e:
+            logger.warning(f"Redis store failed: {e}")
+    with _local_cache_lock:
+        _local_cache.pop(key, None)
+        if len(_local_cache) >= CACHE_SIZE:
+            del _local_cache[next(iter(_local_cache))]
+        _local_cache[key] = entry
+
+def _clear(prefix: str):
+    client = _get_redis()
+    if client is not None:
+        try:
+            keys = list(client.scan_iter(match=prefix + "*"))
+            if keys:
+                client.delete(*keys)
+        except redis.RedisError as e:
+            logger.warning(f"Redis clear failed: {e}")
+    with _local_cache_lock:
+        for key in [k for k in _local_cache if k.startswith(prefix)]:
+            del _local_cache[key]
+
+def calendar_cached(policy: str = "normal"):
+    """
+    Cache a Calendar read function's results, keyed on its arguments.
+
+    Results are reused for CACHE_POLICIES[policy] seconds (Redis when
+    REDIS_URL is set and redis is installed, else in-process). Each entry
+    is stored with the time it was fetched. For STALE_POLICIES, a failed
+    call returns an entry that expired less than STALE_TTL seconds ago
+    instead of raising; other policies always raise.
+
+    Arguments must have a stable repr (strings, numbers, datetimes), and
+    results must be picklable. The wrapper's cache_clear() drops every
+    entry of the function, stale ones included, e.g. after a write that
+    changes what it would return.
+    """
+    ttl = CACHE_POLICIES[policy]
+    max_age = ttl + STALE_TTL if policy in STALE_POLICIES else ttl
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = _cache_key(fn, args, kwargs)
+            entry = _lookup(key, max_age)
+            if entry is not None and time.time() - entry[0] < ttl:
+                return entry[1]
+            try:
+                value = fn(*args, **kwargs)
+            except Exception:
+                if entry is None:
+                    raise
+                logger.warning(f"{fn.__name__} failed, returning result from {time.time() - entry[0]:.0f}s ago",
+                               exc_info=True)
+                return entry[1]
+            _store(key, (time.time(), value), max_age)
+            return value
+        wrapper.cache_clear = lambda: _clear(_key_prefix(fn))
+        return wrapper
+    return decorator
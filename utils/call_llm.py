@@ -1,4 +1,6 @@
-from anthropic import AnthropicVertex
+from anthropic import AnthropicVertex, AsyncAnthropicVertex
+import asyncio
+import httpx
 import logging
 from functools import lru_cache
 import os
@@ -10,9 +12,45 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+MODEL = os.environ.get("ANTHROPIC_MODEL", "claude-3-7-sonnet@20250219")
+
+# Upper bound on in-flight LLM requests when emails are processed in parallel
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+
+# One keep-alive HTTP/2 pool per client so calls skip the TCP+TLS handshake
+HTTP_TIMEOUT = 60.0
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=32, max_connections=64)
+
+_client = None
+_async_client = None
+_llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+_async_cache = {}
+
+def _get_client() -> AnthropicVertex:
+    global _client
+    if _client is None:
+        # Region and project are read from CLOUD_ML_REGION / ANTHROPIC_VERTEX_PROJECT_ID
+        _client = AnthropicVertex(
+            http_client=httpx.Client(http2=True, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+        )
+    return _client
+
+def _get_async_client() -> AsyncAnthropicVertex:
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncAnthropicVertex(
+            http_client=httpx.AsyncClient(http2=True, timeout=HTTP_TIMEOUT, limits=HTTP_LIMITS)
+        )
+    return _async_client
+
 @lru_cache(maxsize=1000)
 def _cached_call_llm(prompt: str) -> str:
-    return "This is a test response"
+    message = _get_client().messages.create(
+        model=MODEL,
+        max_tokens=1024,
+        messages=[{"role": "user", "content": prompt}]
+    )
+    return message.content[0].text
 
 def call_llm(prompt: str, use_cache: bool = True) -> str:
     """
@@ -35,6 +73,41 @@ def call_llm(prompt: str, use_cache: bool = True) -> str:
     
     logger.info(f"LLM response received (first 100 chars): {response}...")
     return response
+
+async def call_llm_async(prompt: str, use_cache: bool = True) -> str:
+    """
+    Async variant of call_llm for use inside AsyncNode.exec_async.
+    
+    Concurrent callers share one client and are throttled by a semaphore
+    (LLM_MAX_CONCURRENCY) so parallel batches stay within rate limits.
+    
+    Args:
+        prompt (str): The prompt to send to the LLM
+        use_cache (bool): Whether to use cached results. Defaults to True.
+    
+    Returns:
+        str: The LLM's response text
+    """
+    logger.info(f"Calling LLM (async) with prompt: {prompt}...")
+    
+    if use_cache and prompt in _async_cache:
+        return _async_cache[prompt]
+    
+    async with _llm_semaphore:
+        message = await _get_async_client().messages.create(
+            model=MODEL,
+            max_tokens=1024,
+            messages=[{"role": "user", "content": prompt}]
+        )
+    response = message.content[0].text
+    
+    if use_cache:
+        if len(_async_cache) >= 1000:
+            _async_cache.pop(next(iter(_async_cache)))
+        _async_cache[prompt] = response
+    
+    logger.info(f"LLM response received (first 100 chars): {response}...")
+    return response
             
 def main():
     """Test the LLM call functionality."""
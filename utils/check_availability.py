@@ -1,12 +1,138 @@
 import datetime
 import zoneinfo  # For timezone handling
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from typing import List, Tuple
 
+from utils.calendar_cache import calendar_cached
+from utils.retry import retry_transient
+# Busy times must come from the calendar meetings are booked on
+from utils.schedule_meeting import get_calendar_service
+
+# All scheduling times in this project are Eastern Time
+TIMEZONE = zoneinfo.ZoneInfo("America/New_York")
+
+Interval = Tuple[datetime.datetime, datetime.datetime]
+
+@calendar_cached("normal")
+@retry_transient
+def _query_busy(calendar_id: str,
+                start_time: datetime.datetime, end_time: datetime.datetime) -> List[Interval]:
+    """
+    Fetch busy intervals for the whole range with a single freeBusy query.
+    
+    Cached for 30 seconds, so emails in a batch asking about the same
+    range share one query. Rate limits and 5xx errors are retried.
+    """
+    body = {
+        "timeMin": start_time.isoformat(),
+        "timeMax": end_time.isoformat(),
+        "timeZone": str(TIMEZONE),
+        "items": [{"id": calendar_id}]
+    }
+    response = get_calendar_service().freebusy().query(body=body).execute()
+    return [
+        (datetime.datetime.fromisoformat(b["start"]).astimezone(TIMEZONE),
+         datetime.datetime.fromisoformat(b["end"]).astimezone(TIMEZONE))
+        for b in response["calendars"][calendar_id].get("busy", [])
+    ]
+
+def clear_busy_cache():
+    """Forget cached freeBusy results; call after creating or moving an event."""
+    _query_busy.cache_clear()
+
+def _working_windows(start_time: datetime.datetime, end_time: datetime.datetime,
+                     working_hours: Tuple[int, int]) -> List[Interval]:
+    """Clip each weekday in the range to working hours."""
+    windows = []
+    day = start_time.date()
+    while day <= end_time.date():
+        if day.weekday() < 5:
+            window_start = datetime.datetime.combine(day, datetime.time(working_hours[0]), TIMEZONE)
+            window_end = datetime.datetime.combine(day, datetime.time(working_hours[1]), TIMEZONE)
+            window_start, window_end = max(window_start, start_time), min(window_end, end_time)
+            if window_start < window_end:
+                windows.append((window_start, window_end))
+        day += datetime.timedelta(days=1)
+    return windows
+
+def _merge(intervals: List[Interval]) -> List[Interval]:
+    """Sort and coalesce overlapping or touching intervals."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def _free_slots(windows: List[Interval], busy: List[Interval],
+                min_duration: datetime.timedelta) -> List[Interval]:
+    """
+    Subtract busy intervals from working windows in one sweep.
+    
+    Both lists are sorted, so each busy interval is visited at most once per
+    window it overlaps: O((windows + busy) log busy) overall instead of
+    scanning the range minute by minute.
+    """
+    busy = _merge(busy)
+    slots = []
+    i = 0
+    for window_start, window_end in windows:
+        # Skip busy blocks that ended before this window
+        while i < len(busy) and busy[i][1] <= window_start:
+            i += 1
+        cursor = window_start
+        j = i
+        while j < len(busy) and busy[j][0] < window_end:
+            busy_start, busy_end = busy[j]
+            if busy_start - cursor >= min_duration:
+                slots.append((cursor, busy_start))
+            cursor = max(cursor, busy_end)
+            j += 1
+        if window_end - cursor >= min_duration:
+            slots.append((cursor, window_end))
+    return slots
+
 def check_availability(start_time: datetime.datetime, 
                       end_time: datetime.datetime,
                       calendar_id: str = 'primary',
                       min_duration: datetime.timedelta = datetime.timedelta(minutes=30),
                       working_hours: Tuple[int, int] = (9, 17)) -> List[Tuple[datetime.datetime, datetime.datetime]]:
-    pass
+    """
+    Check Google Calendar for free slots between start_time and end_time.
+    
+    Args:
+        start_time: Start of the range (naive datetimes are treated as ET)
+        end_time: End of the range (naive datetimes are treated as ET)
+        calendar_id: Calendar to check. Defaults to 'primary', the user's own
+            calendar that schedule_meeting books on.
+        min_duration: Shortest free window worth returning
+        working_hours: (start_hour, end_hour) or {"start": ..., "end": ...}; weekends are skipped
+    
+    Returns:
+        List of (start, end) free windows, each at least min_duration long.
+        Naive inputs give naive ET results.
+    """
+    if isinstance(working_hours, dict):
+        working_hours = (working_hours["start"], working_hours["end"])
+    
+    naive = start_time.tzinfo is None
+    if naive:
+        start_time = start_time.replace(tzinfo=TIMEZONE)
+    if end_time.tzinfo is None:
+        end_time = end_time.replace(tzinfo=TIMEZONE)
+    
+    busy = _query_busy(calendar_id, start_time, end_time)
+    slots = _free_slots(_working_windows(start_time, end_time, working_hours), busy, min_duration)
+    
+    if naive:
+        slots = [(s.replace(tzinfo=None), e.replace(tzinfo=None)) for s, e in slots]
+    return slots
+
+def main():
+    """Print free slots for the next 7 days."""
+    now = datetime.datetime.now()
+    for start, end in check_availability(now, now + datetime.timedelta(days=7)):
+        print(f"{start:%a %Y-%m-%d %H:%M} - {end:%H:%M}")
+
+if __name__ == "__main__":
+    main()
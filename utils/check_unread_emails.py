@@ -1,47 +1,547 @@
+import asyncio
 import imaplib
+import itertools
 import email
-from email.header import decode_header
-from email.utils import getaddresses
-from typing import List, Dict
+from email.header import decode_header, make_header
+from email.message import Message
+from email.utils import getaddresses, parsedate_to_datetime
+from dataclasses import dataclass, field
+from typing import Callable, Container, List, Dict, FrozenSet, Optional, Tuple
 from datetime import datetime
 import os
+import re
+import select
+import ssl
+import threading
+import time
+
+from utils.retry import retry_transient
 
 # IMAP server settings for Gmail
 IMAP_SERVER = "imap.gmail.com"
 IMAP_PORT = 993
+# Seconds a connect, login or single read may block; IDLE waits are bounded separately
+IMAP_TIMEOUT = 60
+
+# Gmail ends IDLE after about 29 minutes, so IDLE is re-issued before that
+IDLE_REFRESH = 25 * 60
+# Seconds between SEARCHes for servers without IDLE
+POLL_INTERVAL = 30
+# Longest an IDLE or poll wait blocks before checking for stop_waiting()
+STOP_CHECK_INTERVAL = 1.0
+
+_stop_waiting = threading.Event()
+
+_ADDR_RE = re.compile(r"[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}")
+# Quoted names, comments and group syntax can hide or fake addresses; those need the full parser
+_NEEDS_PARSER = ('"', "'", "(", ":")
 
 def parse_email_addresses(header_value: str) -> List[str]:
     """
     Parse email addresses from a header value, handling multiple addresses.
-    Returns a list of email addresses.
+    Returns a list of lowercased email addresses.
     """
     if not header_value:
         return []
-    # getaddresses handles both "Name <email>" format and multiple addresses
-    parsed = getaddresses([header_value])
-    # Extract just the email part, lowercase it, and strip whitespace
-    return [email.lower().strip() for name, email in parsed]
+    if any(c in header_value for c in _NEEDS_PARSER):
+        # getaddresses handles quoting, comments and groups
+        return [addr.lower().strip() for name, addr in getaddresses([header_value]) if addr]
+    # Plain "addr" / "Name <addr>" lists: one regex scan
+    return list(dict.fromkeys(_ADDR_RE.findall(header_value.lower())))
+
+def connect(username=None, password=None) -> imaplib.IMAP4_SSL:
+    """
+    Open an authenticated IMAP connection with INBOX selected.
+    
+    For callers that manage their own connection; check_unread_emails and
+    wait_for_new_mail otherwise share a pooled connection per account.
+    """
+    username, password = _credentials(username, password)
+    conn = _login(username, password)
+    conn.select("INBOX")
+    return conn
+
+def _login(username: str, password: str) -> imaplib.IMAP4_SSL:
+    conn = imaplib.IMAP4_SSL(IMAP_SERVER, IMAP_PORT, timeout=IMAP_TIMEOUT)
+    conn.login(username, password)
+    # imaplib keeps the capabilities greeted before login; Gmail only
+    # advertises SORT and IDLE once authenticated, so ask again (once per
+    # connection, pooled ones keep the answer)
+    typ, data = conn.capability()
+    if typ == "OK":
+        conn.capabilities = tuple(data[-1].decode("ascii").upper().split())
+    return conn
 
-def check_unread_emails(username=None, password=None) -> List[Dict]:
+# Logged-in connections reused across calls, keyed by (server, username)
+_IMAP_POOL: Dict[Tuple[str, str], imaplib.IMAP4_SSL] = {}
+_IMAP_POOL_LOCK = threading.Lock()
+# One command sequence at a time per pooled connection
+_IMAP_USE_LOCKS: Dict[Tuple[str, str], threading.Lock] = {}
+
+def _credentials(username=None, password=None) -> Tuple[str, str]:
+    return (username or os.environ.get("EMAIL_USERNAME"),
+            password or os.environ.get("EMAIL_PASSWORD"))
+
+def _get_conn(username: str, password: str) -> imaplib.IMAP4_SSL:
+    """
+    Return the pooled connection for username, reconnecting if it went stale.
+    
+    The caller holds the account's use lock (see _pooled). The pool lock
+    only guards the dict, so the NOOP and login run outside it and one
+    account's slow server does not hold up the others.
+    """
+    key = (IMAP_SERVER, username)
+    with _IMAP_POOL_LOCK:
+        conn = _IMAP_POOL.get(key)
+    if conn is not None:
+        try:
+            conn.noop()
+            return conn
+        except (imaplib.IMAP4.abort, imaplib.IMAP4.error, OSError):
+            _discard_conn(username, conn)
+    conn = _login(username, password)
+    with _IMAP_POOL_LOCK:
+        _IMAP_POOL[key] = conn
+    return conn
+
+def _discard_conn(username: str, conn: imaplib.IMAP4_SSL):
+    """Drop a pooled connection after an error so the next call reconnects."""
+    with _IMAP_POOL_LOCK:
+        if _IMAP_POOL.get((IMAP_SERVER, username)) is conn:
+            del _IMAP_POOL[(IMAP_SERVER, username)]
+    _close(conn)
+
+def _close(conn: imaplib.IMAP4_SSL):
+    try:
+        conn.logout()
+    except (imaplib.IMAP4.error, OSError):
+        pass
+
+@retry_transient
+def _pooled(username: str, password: str, fn, *args):
+    """
+    Run fn(conn, *args) on the account's pooled connection with INBOX selected.
+    
+    Any error drops the connection; dropped connections (IMAP4.abort) and
+    timeouts are retried with backoff on a fresh login.
+    """
+    with _IMAP_POOL_LOCK:
+        use_lock = _IMAP_USE_LOCKS.setdefault((IMAP_SERVER, username), threading.Lock())
+    with use_lock:
+        conn = _get_conn(username, password)
+        try:
+            # Mailbox selection is per call; only the login is pooled
+            conn.select("INBOX")
+            return fn(conn, *args)
+        except Exception:
+            _discard_conn(username, conn)
+            raise
+
+def wait_for_new_mail(username=None, password=None, timeout: float = 300, conn=None) -> bool:
+    """
+    Block in IMAP IDLE (RFC 2177) until the server pushes new mail or timeout expires.
+    
+    Uses the pooled connection for the account unless a connection from
+    connect() is passed as 'conn'.
+    
+    Returns:
+        True if the server reported new messages (EXISTS), False on timeout
+        or after stop_waiting()
+    """
+    if conn is not None:
+        return _idle(conn, timeout)
+    username, password = _credentials(username, password)
+    return _pooled(username, password, _idle, timeout)
+
+# imaplib has no IDLE command before Python 3.14, so _idle sends it and reads
+# the responses itself, under tags of its own that cannot clash with imaplib's
+_idle_tags = itertools.count(1)
+
+def _idle(conn: imaplib.IMAP4_SSL, timeout: float) -> bool:
+    tag = b"IDLE%d" % next(_idle_tags)
+    conn.send(tag + b" IDLE\r\n")
+    
+    # Untagged responses may arrive before the continuation, e.g. mail that
+    # landed between the last SEARCH and this IDLE
+    new_mail = False
+    while True:
+        line = conn.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("connection closed while entering IDLE")
+        if line.startswith(b"+"):
+            break
+        if line.startswith(tag):
+            raise imaplib.IMAP4.error(f"IDLE rejected by server: {line!r}")
+        if line.rstrip().endswith(b"EXISTS"):
+            new_mail = True
+    
+    deadline = time.monotonic() + timeout
+    while not new_mail and not _stop_waiting.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if not _has_data(conn) and not select.select([conn.sock], [], [], min(remaining, STOP_CHECK_INTERVAL))[0]:
+            continue
+        line = conn.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("connection closed during IDLE")
+        if line.rstrip().endswith(b"EXISTS"):
+            new_mail = True
+    
+    # Leave IDLE and consume responses up to the tagged completion
+    conn.send(b"DONE\r\n")
+    while True:
+        line = conn.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("connection closed while leaving IDLE")
+        if line.startswith(tag):
+            break
+    return new_mail
+
+def stop_waiting():
+    """
+    Make IDLE and polling waits return within STOP_CHECK_INTERVAL seconds.
+
+    For shutdown: a wait running in a worker thread (asyncio.to_thread)
+    otherwise keeps the process alive for up to its full timeout after
+    Ctrl-C. Waits started afterwards return at once.
+    """
+    _stop_waiting.set()
+
+def _has_data(conn: imaplib.IMAP4_SSL) -> bool:
+    """
+    True if a response can be read without waiting.
+
+    readline() goes through the buffered conn.file, so lines that arrived
+    together with an earlier one (e.g. EXISTS right after the IDLE
+    continuation) sit in its buffer, where select() cannot see them. A
+    non-blocking peek looks there, and reads whatever the socket already has.
+    """
+    timeout = conn.sock.gettimeout()
+    conn.sock.setblocking(False)
+    try:
+        return bool(conn.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError):
+        return False
+    finally:
+        conn.sock.settimeout(timeout)
+
+def _decode(value: Optional[str]) -> str:
+    """Decode RFC 2047 encoded-words in a header value."""
+    if not value:
+        return ""
+    # Most headers have no encoded-words; skip the RFC 2047 parser for them.
+    # Raw 8-bit headers arrive as Header objects and take the full path
+    if isinstance(value, str) and "=?" not in value:
+        return value
+    return str(make_header(decode_header(value)))
+
+def _get_body(msg: Message) -> str:
+    """Return the text/plain part if present, otherwise the text/html part."""
+    parts = msg.walk() if msg.is_multipart() else [msg]
+    html = None
+    for part in parts:
+        if part.get_content_maintype() == "multipart" or part.get_filename():
+            continue
+        payload = part.get_payload(decode=True)
+        if payload is None:
+            continue
+        text = payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+        if part.get_content_type() == "text/plain":
+            return text
+        if part.get_content_type() == "text/html" and html is None:
+            html = text
+    return html or ""
+
+# Everything _parse_headers reads, plus what is needed to decode the body later
+HEADER_FIELDS = ("FROM TO CC BCC SUBJECT DATE MESSAGE-ID IN-REPLY-TO REFERENCES REPLY-TO "
+                 "MIME-VERSION CONTENT-TYPE CONTENT-TRANSFER-ENCODING")
+_UID_RE = re.compile(rb"UID (\d+)")
+
+@dataclass(slots=True, eq=False)
+class Email:
+    """
+    One unread email. Slotted, with tuple recipient lists and a POSIX
+    timestamp, so a large batch stays small and fields are plain attributes.
+    
+    'body' is downloaded on first access, or for many emails at once with
+    load_bodies. Pickling (e.g. into the pending store) loads it first, so
+    stored emails never depend on the IMAP connection.
     """
-    Connect to Gmail API to fetch unread emails from user's inbox and mark them as read.
+    sender: str
+    sender_addr: str
+    to: Tuple[str, ...]
+    cc: Tuple[str, ...]
+    cc_addrs: FrozenSet[str]
+    bcc: Tuple[str, ...]
+    bcc_addrs: FrozenSet[str]
+    subject: str
+    timestamp: float
+    message_id: str
+    in_reply_to: Optional[str]
+    references: Tuple[str, ...]
+    reply_to: Optional[str]
+    uid: Optional[bytes] = field(default=None, repr=False)
+    _body: Optional[str] = field(default=None, repr=False)
+    _raw_headers: bytes = field(default=b"", repr=False)
+    _fetch_texts: Optional[Callable] = field(default=None, repr=False)
+    
+    @property
+    def body(self) -> str:
+        if self._body is None:
+            self._set_text(self._fetch_texts([self.uid]).get(self.uid, b""))
+        return self._body
+    
+    def _set_text(self, text: bytes):
+        self._body = _get_body(email.message_from_bytes(self._raw_headers + text))
+    
+    def __reduce__(self):
+        return (Email, (self.sender, self.sender_addr, self.to, self.cc, self.cc_addrs,
+                        self.bcc, self.bcc_addrs, self.subject, self.timestamp, self.message_id,
+                        self.in_reply_to, self.references, self.reply_to, self.uid, self.body))
+
+def _parse_headers(msg: Message, uid: bytes, raw_headers: bytes, fetch_texts) -> Email:
+    try:
+        timestamp = parsedate_to_datetime(msg["Date"]).timestamp()
+    except (TypeError, ValueError):
+        timestamp = time.time()
+    sender = _decode(msg["From"])
+    sender_addrs = parse_email_addresses(sender)
+    cc = tuple(parse_email_addresses(_decode(msg["Cc"])))
+    bcc = tuple(parse_email_addresses(_decode(msg["Bcc"])))
+    return Email(
+        sender=sender,
+        sender_addr=sender_addrs[0] if sender_addrs else "",
+        to=tuple(parse_email_addresses(_decode(msg["To"]))),
+        cc=cc,
+        cc_addrs=frozenset(cc),
+        bcc=bcc,
+        bcc_addrs=frozenset(bcc),
+        subject=_decode(msg["Subject"]),
+        timestamp=timestamp,
+        message_id=(msg["Message-ID"] or "").strip(),
+        in_reply_to=(msg["In-Reply-To"] or "").strip() or None,
+        references=tuple((msg["References"] or "").split()),
+        reply_to=_decode(msg["Reply-To"]) or None,
+        uid=uid,
+        _raw_headers=raw_headers,
+        _fetch_texts=fetch_texts
+    )
+
+def load_bodies(emails: List[Email]):
+    """Download the bodies of emails not loaded yet, in one FETCH per connection."""
+    groups = {}
+    for e in emails:
+        if e._body is None:
+            groups.setdefault(e._fetch_texts, []).append(e)
+    for fetch_texts, group in groups.items():
+        texts = fetch_texts([e.uid for e in group])
+        for e in group:
+            e._set_text(texts.get(e.uid, b""))
+
+def _literals_by_uid(data) -> Dict[bytes, bytes]:
+    """Map UID -> literal for a UID FETCH response of one body section per message."""
+    result = {}
+    for i, item in enumerate(data):
+        if not isinstance(item, tuple):
+            continue
+        # UID is usually before the literal, but servers may send it after
+        m = _UID_RE.search(item[0])
+        if m is None and i + 1 < len(data) and isinstance(data[i + 1], bytes):
+            m = _UID_RE.search(data[i + 1])
+        if m is not None:
+            result[m.group(1)] = item[1]
+    return result
+
+def _fetch_texts(conn: imaplib.IMAP4_SSL, uids: List[bytes]) -> Dict[bytes, bytes]:
+    texts = {}
+    for uid_set in _uid_sets(uids):
+        typ, data = conn.uid("FETCH", uid_set, "(BODY.PEEK[TEXT])")
+        if typ != "OK":
+            raise imaplib.IMAP4.error(f"FETCH failed: {data!r}")
+        texts.update(_literals_by_uid(data))
+    return texts
+
+# Marks the given emails as read; returned next to the emails it acknowledges
+Ack = Callable[[List[Email]], None]
+
+def check_unread_emails(username=None, password=None, conn=None) -> Tuple[List[Email], Ack]:
+    """
+    Connect to Gmail API to fetch unread emails from user's inbox.
+    
+    Fetching leaves the emails unread (BODY.PEEK). Call the returned ack
+    with the emails once they are handled: it marks them read in one UID
+    STORE. Emails never acknowledged stay unread and are returned again
+    by the next call.
     
     Args:
         username: Gmail address (optional, defaults to env var)
         password: App-specific password (optional, defaults to env var)
+        conn: Connection from connect() (optional). When given, it is used and
+            left open; otherwise the account's pooled connection is used, which
+            stays logged in between calls.
     
     Returns:
-        List of dicts containing email info:
+        (emails, ack), where emails is a list of Email records:
         - sender: Email address of sender
-        - to: Email addresses of To recipients
-        - cc: Email addresses of CC recipients
-        - bcc: Email addresses of BCC recipients
+        - sender_addr: Bare lowercased address of sender
+        - to: Tuple of email addresses of To recipients
+        - cc: Tuple of email addresses of CC recipients
+        - cc_addrs: Frozenset of lowercased CC addresses
+        - bcc: Tuple of email addresses of BCC recipients
+        - bcc_addrs: Frozenset of lowercased BCC addresses
         - subject: Email subject
-        - body: Email body text
-        - timestamp: When email was received
+        - body: Email body text, downloaded on first access (see load_bodies)
+        - timestamp: When email was received (POSIX timestamp)
         - message_id: Unique identifier of the email
         - in_reply_to: Message ID of the email this one is replying to (if any)
-        - references: Thread reference IDs
+        - references: Tuple of thread reference IDs
         - reply_to: Email address for replies if provided
     """
-    pass
\ No newline at end of file
+    if conn is not None:
+        emails = _fetch_unread(conn, lambda uids: _fetch_texts(conn, uids))
+        return emails, lambda acked: _mark_seen(conn, [e.uid for e in acked])
+    username, password = _credentials(username, password)
+    emails = _pooled(username, password, _fetch_unread, _pooled_texts(username, password))
+    return emails, _pooled_ack(username, password)
+
+def _pooled_texts(username: str, password: str):
+    return lambda uids: _pooled(username, password, _fetch_texts, uids)
+
+def _pooled_ack(username: str, password: str) -> Ack:
+    return lambda acked: _pooled(username, password, _mark_seen, [e.uid for e in acked])
+
+def mark_unread(emails: List[Email], username=None, password=None):
+    """
+    Clear \\Seen on acknowledged emails, so they show as unread again.
+    
+    For emails the caller gave up on after acknowledging them, so that a
+    person still sees them.
+    """
+    username, password = _credentials(username, password)
+    _pooled(username, password, _mark_seen, [e.uid for e in emails], False)
+
+def _mark_seen(conn: imaplib.IMAP4_SSL, uids: List[bytes], seen: bool = True):
+    """Set (or clear) \\Seen on the UIDs, one STORE per UID set (normally one in total)."""
+    if not uids:
+        return
+    for uid_set in _uid_sets(uids):
+        # .SILENT: no untagged FETCH echo of the new flags
+        typ, data = conn.uid("STORE", uid_set, "+FLAGS.SILENT" if seen else "-FLAGS.SILENT", "(\\Seen)")
+        if typ != "OK":
+            raise imaplib.IMAP4.error(f"STORE failed: {data!r}")
+
+# Servers cap command line length (RFC 7162 suggests staying under 8192 octets)
+MAX_UID_SET_LEN = 8000
+
+def _uid_sets(uids: List[bytes]) -> List[str]:
+    """
+    Compress UIDs into IMAP sequence sets ("3:7,9,12:14"), split so each
+    set fits on one command line. Almost always a single set.
+    """
+    nums = sorted(int(u) for u in uids)
+    ranges = []
+    start = prev = nums[0]
+    for n in nums[1:]:
+        if n != prev + 1:
+            ranges.append(f"{start}:{prev}" if prev != start else str(start))
+            start = n
+        prev = n
+    ranges.append(f"{start}:{prev}" if prev != start else str(start))
+    
+    sets, current = [], ""
+    for r in ranges:
+        if current and len(current) + len(r) + 1 > MAX_UID_SET_LEN:
+            sets.append(current)
+            current = ""
+        current = f"{current},{r}" if current else r
+    sets.append(current)
+    return sets
+
+def _fetch_unread(conn: imaplib.IMAP4_SSL, fetch_texts) -> List[Email]:
+    # Oldest first: let the server sort by arrival when it can (RFC 5256);
+    # otherwise ascending UIDs already follow arrival order in practice
+    if "SORT" in conn.capabilities:
+        typ, data = conn.uid("SORT", "(ARRIVAL)", "UTF-8", "UNSEEN")
+    else:
+        typ, data = conn.uid("SEARCH", None, "UNSEEN")
+    if typ != "OK":
+        raise imaplib.IMAP4.error(f"SEARCH failed: {data!r}")
+    uids = data[0].split()
+    if not uids:
+        return []
+    
+    # Headers only, one round-trip per UID set (normally one in total); bodies
+    # are fetched later for the emails that need them. PEEK leaves \Seen unset
+    uid_sets = _uid_sets(uids)
+    headers = {}
+    for uid_set in uid_sets:
+        typ, data = conn.uid("FETCH", uid_set, f"(BODY.PEEK[HEADER.FIELDS ({HEADER_FIELDS})])")
+        if typ != "OK":
+            raise imaplib.IMAP4.error(f"FETCH failed: {data!r}")
+        headers.update(_literals_by_uid(data))
+    # FETCH answers in mailbox order; keep the SEARCH/SORT order
+    return [
+        _parse_headers(email.message_from_bytes(headers[uid]), uid, headers[uid], fetch_texts)
+        for uid in uids if uid in headers
+    ]
+
+def idle_wait_for_unread(username=None, password=None, timeout: float = 300,
+                         skip: Container[str] = ()) -> Tuple[List[Email], Ack]:
+    """
+    Wait up to 'timeout' seconds for unread emails and return them, still unread.
+    
+    Returns at once if mail is already unread. Otherwise the server pushes
+    new mail through IDLE, re-issued every IDLE_REFRESH seconds; servers
+    without IDLE are polled with SEARCH every POLL_INTERVAL seconds.
+    
+    Args:
+        skip: Message-IDs of unread emails to ignore, e.g. ones the caller
+            gave up on and left unread on purpose
+    
+    Returns:
+        (emails, ack) as from check_unread_emails; emails is empty on timeout
+    """
+    username, password = _credentials(username, password)
+    deadline = time.monotonic() + timeout
+    fetch_texts = _pooled_texts(username, password)
+    
+    def wait(conn):
+        while True:
+            emails = [e for e in _fetch_unread(conn, fetch_texts) if e.message_id not in skip]
+            remaining = deadline - time.monotonic()
+            if emails or remaining <= 0 or _stop_waiting.is_set():
+                return emails
+            if "IDLE" in conn.capabilities:
+                _idle(conn, min(remaining, IDLE_REFRESH))
+            else:
+                _stop_waiting.wait(min(remaining, POLL_INTERVAL))
+    
+    return _pooled(username, password, wait), _pooled_ack(username, password)
+
+async def check_unread_emails_many(accounts: List[Tuple[str, str]]) -> List[Tuple[List[Email], Ack]]:
+    """
+    Check several mailboxes concurrently.
+    
+    Each (username, password) account runs check_unread_emails on its own
+    pooled connection in a worker thread, so N mailboxes take about as
+    long as the slowest one instead of the sum of all of them.
+    
+    Returns:
+        One (emails, ack) pair per account, in the order given
+    """
+    return await asyncio.gather(*[
+        asyncio.to_thread(check_unread_emails, username, password)
+        for username, password in accounts
+    ])
+
+def main():
+    """Print unread emails (leaving them unread), then wait for new mail once."""
+    emails, _ = check_unread_emails()
+    for e in emails:
+        print(f"{datetime.fromtimestamp(e.timestamp):%Y-%m-%d %H:%M} {e.sender}: {e.subject}")
+    print("Waiting for new mail...")
+    print(f"New mail: {wait_for_new_mail(timeout=60)}")
+
+if __name__ == "__main__":
+    main()
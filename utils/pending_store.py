@@ -0,0 +1,78 @@
+import os
+import pickle
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from typing import Iterator
+
+DEFAULT_PATH = os.path.join(
+    os.environ.get("SCHEDULER_CACHE_DIR", os.path.expanduser("~/.cache/scheduler")),
+    "pending.sqlite3"
+)
+
+class PendingStore(MutableMapping):
+    """
+    Dict-like store of pending emails persisted in sqlite (WAL mode).
+    
+    Values are pickled, so reads return copies: nested changes must be
+    written back with `store[key] = value` to be persisted. Entries survive
+    process restarts, which lets the flow resume in-flight emails.
+    """
+    def __init__(self, path: str = DEFAULT_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending (key TEXT PRIMARY KEY, value BLOB NOT NULL)"
+        )
+        self._conn.commit()
+    
+    def __getitem__(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM pending WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return pickle.loads(row[0])
+    
+    def __setitem__(self, key: str, value):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO pending (key, value) VALUES (?, ?)", (key, blob))
+            self._conn.commit()
+    
+    def __delitem__(self, key: str):
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM pending WHERE key = ?", (key,))
+            self._conn.commit()
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+    
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute("SELECT key FROM pending")]
+        return iter(keys)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+    
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM pending WHERE key = ?", (key,)).fetchone() is not None
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def main(path: str = DEFAULT_PATH):
+    """List the emails persisted in the store at path and their stage."""
+    store = PendingStore(path)
+    for key, value in store.items():
+        status = f"{value.get('stage') or 'new'}{' (failed)' if value.get('failed') else ''}"
+        print(f"{key}: {status} - {value['email'].subject or 'No subject'}")
+    store.close()
+
+if __name__ == "__main__":
+    main()
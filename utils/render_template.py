@@ -0,0 +1,37 @@
+import os
+from functools import lru_cache
+from string import Template
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+
+@lru_cache(maxsize=None)
+def _load_template(name: str) -> Template:
+    with open(os.path.join(TEMPLATE_DIR, name), encoding="utf-8") as f:
+        return Template(f.read())
+
+def render_template(name: str, **values) -> str:
+    """
+    Render an email template from the templates/ directory.
+    
+    Args:
+        name (str): Template file name, e.g. "proposal.txt"
+        **values: Values for the $placeholders in the template
+    
+    Returns:
+        str: The rendered text
+    
+    Raises:
+        KeyError: If a placeholder has no value
+    """
+    return _load_template(name).substitute(values)
+
+def main():
+    """Render the proposal template with sample values."""
+    print(render_template(
+        "proposal.txt",
+        duration=30,
+        slots="- 10:00 AM ET on January 06, 2025 to 11:00 AM ET"
+    ))
+
+if __name__ == "__main__":
+    main()
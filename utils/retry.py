@@ -0,0 +1,64 @@
+import asyncio
+import functools
+import imaplib
+import inspect
+import logging
+import random
+import smtplib
+import time
+
+from googleapiclient.errors import HttpError
+
+logger = logging.getLogger(__name__)
+
+# Up to RETRY_ATTEMPTS calls, sleeping 1, 2, 4, 8... seconds (capped, with jitter) in between
+RETRY_ATTEMPTS = 5
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+
+# Rate limiting and server-side failures; other HTTP errors (auth, bad request) are final
+RETRYABLE_HTTP_STATUS = {429, 500, 502, 503, 504}
+
+def is_transient(exc: BaseException) -> bool:
+    """True for errors worth retrying: rate limits, 5xx, dropped connections, timeouts."""
+    if isinstance(exc, HttpError):
+        return exc.resp.status in RETRYABLE_HTTP_STATUS
+    return isinstance(exc, (smtplib.SMTPServerDisconnected, imaplib.IMAP4.abort,
+                            ConnectionError, TimeoutError))
+
+def _retry_delay(fn, exc: Exception, attempt: int) -> float:
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+    logger.warning(f"{fn.__name__} failed ({exc!r}), retry {attempt}/{RETRY_ATTEMPTS - 1} in {delay:.1f}s")
+    return delay
+
+def retry_transient(fn):
+    """
+    Retry fn with exponential backoff while it raises transient errors.
+
+    fn must leave nothing broken behind when it raises (e.g. drop its
+    pooled connection first), so the next attempt starts clean. Anything
+    is_transient rejects, such as a failed login, is raised at once.
+    Coroutine functions are retried with asyncio.sleep between attempts.
+    """
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            for attempt in range(1, RETRY_ATTEMPTS + 1):
+                try:
+                    return await fn(*args, **kwargs)
+                except Exception as e:
+                    if attempt == RETRY_ATTEMPTS or not is_transient(e):
+                        raise
+                    await asyncio.sleep(_retry_delay(fn, e, attempt))
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        for attempt in range(1, RETRY_ATTEMPTS + 1):
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == RETRY_ATTEMPTS or not is_transient(e):
+                    raise
+                time.sleep(_retry_delay(fn, e, attempt))
+    return wrapper
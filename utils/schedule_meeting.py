@@ -1,5 +1,11 @@
 from __future__ import print_function
+import hashlib
+import json
+import logging
 import os.path
+import threading
+import time
+import zoneinfo
 from typing import Dict, List, Optional
 from datetime import datetime
 
@@ -7,16 +13,153 @@ from googleapiclient.discovery import build
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
+
+from utils.retry import retry_transient
+try:
+    # Optional: shares the created-event cache between processes
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
+# OAuth client secrets and the user token saved after the first consent
+CREDENTIALS_PATH = os.environ.get("GOOGLE_OAUTH_CREDENTIALS", "credentials.json")
+TOKEN_PATH = os.environ.get("GOOGLE_OAUTH_TOKEN", "token.json")
+
+# Naive datetimes are Eastern Time, as everywhere else in this project
+TIMEZONE = zoneinfo.ZoneInfo("America/New_York")
+
+# Created events are remembered for this long, so a repeated request is
+# answered without calling the API (the event id already prevents duplicates)
+EVENT_CACHE_TTL = 3600
+EVENT_CACHE_SIZE = 256
+REDIS_URL = os.environ.get("REDIS_URL")
+
+_SERVICE = None
+_CREDS = None
+_service_lock = threading.Lock()
+_redis_client = None
+# key -> (expires_at, event); entries outlive their TTL as a fallback when the API fails
+_local_events = {}
+_local_events_lock = threading.Lock()
+
+def _save_token(creds: Credentials):
+    with open(TOKEN_PATH, "w") as token:
+        token.write(creds.to_json())
+
+def _load_credentials() -> Credentials:
+    """Load token.json, refreshing it or running the consent flow if needed."""
+    creds = None
+    if os.path.exists(TOKEN_PATH):
+        creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
+    if creds and creds.valid:
+        return creds
+    if creds and creds.expired and creds.refresh_token:
+        creds.refresh(Request())
+    else:
+        flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_PATH, SCOPES)
+        creds = flow.run_local_server(port=0)
+    _save_token(creds)
+    return creds
+
 def get_calendar_service():
-    pass
+    """
+    Return the Calendar client, built once per process.
+
+    The client keeps a reference to the credentials, so an expired token
+    is refreshed in place instead of rebuilding the client. It is built
+    from the discovery document bundled with google-api-python-client,
+    so no discovery request is made even on a cold start.
+    """
+    global _SERVICE, _CREDS
+    with _service_lock:
+        if _SERVICE is not None:
+            if not _CREDS.valid:
+                _CREDS.refresh(Request())
+                _save_token(_CREDS)
+            return _SERVICE
+        _CREDS = _load_credentials()
+        _SERVICE = build('calendar', 'v3', credentials=_CREDS,
+                         static_discovery=True, cache_discovery=False)
+        return _SERVICE
+
+def _to_dt(value) -> datetime:
+    """Parse an ISO 8601 / RFC 3339 string; fromisoformat before 3.11 rejects a trailing Z."""
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith(("Z", "z")) else value)
+
+def _to_rfc3339(value) -> str:
+    value = _to_dt(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=TIMEZONE)
+    return value.isoformat()
+
+def _event_key(meeting_details: Dict) -> str:
+    canonical = json.dumps(meeting_details, sort_keys=True, default=str)
+    return "sched:" + hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+@retry_transient
+def _insert_event(event: Dict) -> Dict:
+    """
+    Insert the event, retrying rate limits and 5xx errors.
+
+    The event carries a client-chosen id, so a retry after an insert that
+    succeeded server-side gets 409 Conflict; the existing event is
+    fetched instead of creating a duplicate. It may be a cancelled one:
+    Calendar keeps the ids of deleted events.
+    """
+    service = get_calendar_service()
+    try:
+        # sendUpdates="all" makes Calendar email the invite to every attendee
+        return service.events().insert(calendarId="primary", body=event, sendUpdates="all").execute()
+    except HttpError as e:
+        if e.resp.status != 409:
+            raise
+        return service.events().get(calendarId="primary", eventId=event["id"]).execute()
+
+def _get_redis():
+    global _redis_client
+    if _redis_client is None and redis is not None and REDIS_URL:
+        _redis_client = redis.Redis.from_url(REDIS_URL)
+    return _redis_client
+
+def _cached_event(key: str, allow_stale: bool = False) -> Optional[Dict]:
+    client = _get_redis()
+    if client is not None:
+        try:
+            cached = client.get(key)
+            if cached is not None:
+                return json.loads(cached)
+        except redis.RedisError as e:
+            logger.warning(f"Redis lookup failed, using local cache: {e}")
+    with _local_events_lock:
+        entry = _local_events.get(key)
+    if entry and (allow_stale or entry[0] > time.monotonic()):
+        return entry[1]
+    return None
+
+def _store_event(key: str, event: Dict):
+    client = _get_redis()
+    if client is not None:
+        try:
+            client.setex(key, EVENT_CACHE_TTL, json.dumps(event))
+        except redis.RedisError as e:
+            logger.warning(f"Redis store failed: {e}")
+    with _local_events_lock:
+        _local_events.pop(key, None)
+        if len(_local_events) >= EVENT_CACHE_SIZE:
+            del _local_events[next(iter(_local_events))]
+        _local_events[key] = (time.monotonic() + EVENT_CACHE_TTL, event)
 
 def schedule_meeting(meeting_details: Dict) -> Dict:
     """
     Create and send a Google Calendar meeting invite.
-    
+
     Args:
         meeting_details: Dict containing:
             - title: Meeting title/subject
@@ -25,12 +168,73 @@ def schedule_meeting(meeting_details: Dict) -> Dict:
             - description: Meeting description/agenda
             - attendees: List of guest email addresses
             - location: Optional meeting location/conference link
-    
+
+    The event id is a hash of meeting_details, so identical details
+    return the event created the first time, however long ago, unless it
+    has been cancelled; then a new event is created. For EVENT_CACHE_TTL
+    the event is returned from a cache (Redis when REDIS_URL is set, else
+    in-process) without calling the API. If the API call fails, an older
+    cached event for the same details is returned instead of raising.
+    Rate limits and 5xx errors are retried with backoff first.
+
     Returns:
         Dict containing the created event details including HTML link
-    
+
     Raises:
         ValueError: If required fields are missing
         Exception: For Google Calendar API errors
     """
-    pass
\ No newline at end of file
+    missing = [f for f in ("title", "start_time", "end_time", "attendees") if not meeting_details.get(f)]
+    if missing:
+        raise ValueError(f"Missing required meeting fields: {', '.join(missing)}")
+
+    event = {
+        "summary": meeting_details["title"],
+        "location": meeting_details.get("location", ""),
+        "description": meeting_details.get("description", ""),
+        "start": {"dateTime": _to_rfc3339(meeting_details["start_time"]), "timeZone": str(TIMEZONE)},
+        "end": {"dateTime": _to_rfc3339(meeting_details["end_time"]), "timeZone": str(TIMEZONE)},
+        "attendees": [{"email": email} for email in meeting_details["attendees"]],
+        "reminders": {"useDefault": True}
+    }
+
+    key = _event_key(meeting_details)
+    # Hex digits are valid in Calendar event ids (base32hex, 5-1024 chars)
+    event["id"] = key.split(":", 1)[1]
+    cached = _cached_event(key)
+    if cached is not None:
+        logger.info(f"Meeting already scheduled, reusing event {cached.get('id')}")
+        return cached
+
+    try:
+        created = _insert_event(event)
+        if created.get("status") == "cancelled":
+            # The same meeting was booked before and has since been deleted;
+            # its id stays taken, so book it again under a new one
+            logger.info(f"Event {event['id']} was cancelled, creating a new one")
+            event["id"] += format(time.time_ns(), "x")
+            created = _insert_event(event)
+    except Exception:
+        stale = _cached_event(key, allow_stale=True)
+        if stale is None:
+            raise
+        logger.warning("Calendar API failed, returning previously created event", exc_info=True)
+        return stale
+    _store_event(key, created)
+    return created
+
+def main():
+    """Schedule a 30-minute test meeting tomorrow at 10:00 ET with yourself."""
+    from datetime import timedelta
+    start = (datetime.now() + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+    event = schedule_meeting({
+        "title": "Test meeting",
+        "start_time": start,
+        "end_time": start + timedelta(minutes=30),
+        "description": "Created by utils/schedule_meeting.py",
+        "attendees": [os.environ["EMAIL_USERNAME"]]
+    })
+    print(f"Created: {event.get('htmlLink')}")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,485 @@
+import asyncio
+import base64
+import functools
+import itertools
+import os
+import queue
 import smtplib
+import socket
 import ssl
+import threading
+import time
+import weakref
+from concurrent.futures import Future
 from email.mime.text import MIMEText
-from typing import List, Union, Dict
+from email.utils import formataddr, formatdate, getaddresses
+from typing import List, Union, Dict, Tuple
+
+from utils.retry import retry_transient
+
+# SMTP server settings for Gmail
+SMTP_SERVER = "smtp.gmail.com"
+SMTP_PORT = 465
+
+# A connection idle for longer than this is probed with NOOP before reuse
+NOOP_AFTER = 30
+# Seconds to wait on any single connect, read or write before giving up
+SMTP_TIMEOUT = 60
+
+def _dot_data(msg: bytes) -> bytes:
+    """Message body for DATA: leading dots doubled, ended by <CRLF>.<CRLF>."""
+    q = smtplib._quote_periods(msg)
+    if q[-2:] != smtplib.bCRLF:
+        q += smtplib.bCRLF
+    return q + b"." + smtplib.bCRLF
+
+class PipeliningSMTP(smtplib.SMTP_SSL):
+    """
+    SMTP_SSL that sends MAIL FROM, every RCPT TO and DATA in one write
+    when the server advertises PIPELINING (RFC 2920), then reads the
+    replies in order: one round-trip instead of one per command.
+    
+    Falls back to smtplib's command-by-command sendmail otherwise.
+    """
+    def sendmail(self, from_addr, to_addrs, msg, mail_options=(), rcpt_options=()):
+        self.ehlo_or_helo_if_needed()
+        if not self.has_extn("pipelining") or mail_options or rcpt_options:
+            return super().sendmail(from_addr, to_addrs, msg, mail_options, rcpt_options)
+        if isinstance(to_addrs, str):
+            to_addrs = [to_addrs]
+        if isinstance(msg, str):
+            msg = smtplib._fix_eols(msg).encode("ascii")
+        
+        commands = [f"MAIL FROM:{smtplib.quoteaddr(from_addr)}"]
+        commands += [f"RCPT TO:{smtplib.quoteaddr(addr)}" for addr in to_addrs]
+        commands.append("DATA")
+        self.send("".join(f"{command}\r\n" for command in commands))
+        
+        # Every pipelined command gets a reply, even after a failure
+        mail_reply = self.getreply()
+        refused = {}
+        for addr in to_addrs:
+            code, resp = self.getreply()
+            if code not in (250, 251):
+                refused[addr] = (code, resp)
+        data_code, data_resp = self.getreply()
+        
+        error = None
+        if mail_reply[0] != 250:
+            error = smtplib.SMTPSenderRefused(mail_reply[0], mail_reply[1], from_addr)
+        elif len(refused) == len(to_addrs):
+            error = smtplib.SMTPRecipientsRefused(refused)
+        elif data_code != 354:
+            error = smtplib.SMTPDataError(data_code, data_resp)
+        if error is not None:
+            if data_code == 354:
+                # The server is waiting for a message; end it empty before resetting
+                self.send(b"." + smtplib.bCRLF)
+                self.getreply()
+            self._rset()
+            raise error
+        
+        self.send(_dot_data(msg))
+        code, resp = self.getreply()
+        if code != 250:
+            self._rset()
+            raise smtplib.SMTPDataError(code, resp)
+        return refused
+
+class SMTPSession:
+    """
+    One authenticated SMTP connection reused for many messages.
+    
+    Connects lazily on the first send, serializes sends from concurrent
+    callers, and reconnects with backoff if the server dropped the connection.
+    """
+    def __init__(self, from_email: str, app_password: str,
+                 host: str = SMTP_SERVER, port: int = SMTP_PORT):
+        self.from_email = from_email
+        self.app_password = app_password
+        self.host = host
+        self.port = port
+        self._conn = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+    
+    def _connect(self) -> smtplib.SMTP_SSL:
+        conn = PipeliningSMTP(self.host, self.port, timeout=SMTP_TIMEOUT, context=ssl.create_default_context())
+        conn.login(self.from_email, self.app_password)
+        return conn
+    
+    def _alive(self) -> bool:
+        # Back-to-back sends skip the probe; the retry below covers them
+        if time.monotonic() - self._last_used < NOOP_AFTER:
+            return True
+        try:
+            return self._conn.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+    
+    @retry_transient
+    def sendmail(self, from_addr: str, to_addrs: List[str], msg: str):
+        with self._lock:
+            if self._conn is not None and not self._alive():
+                self._quit()
+            if self._conn is None:
+                self._conn = self._connect()
+            try:
+                result = self._conn.sendmail(from_addr, to_addrs, msg)
+            except (smtplib.SMTPServerDisconnected, OSError):
+                # Drop the connection first so the retry reconnects
+                self._conn.close()
+                self._conn = None
+                raise
+            self._last_used = time.monotonic()
+            return result
+    
+    def _quit(self):
+        try:
+            self._conn.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._conn = None
+    
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._quit()
+
+class AsyncSMTPSession:
+    """
+    asyncio counterpart of SMTPSession, for callers on an event loop.
+    
+    Speaks the subset of ESMTP Gmail needs (EHLO, AUTH PLAIN, NOOP, RSET,
+    QUIT) over asyncio streams. MAIL FROM, every RCPT TO and DATA go out
+    in one write when the server advertises PIPELINING (RFC 2920), and
+    replies are read from the stream buffer, so a send costs two round
+    trips and no thread. Errors are smtplib's exception types; a connect,
+    reply or write that takes longer than 'timeout' seconds raises
+    TimeoutError and drops the connection.
+    """
+    def __init__(self, from_email: str, app_password: str,
+                 host: str = SMTP_SERVER, port: int = SMTP_PORT, timeout: float = SMTP_TIMEOUT):
+        self.from_email = from_email
+        self.app_password = app_password
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+        self._pipelining = False
+        self._last_used = 0.0
+        self._lock = asyncio.Lock()
+    
+    async def _wait(self, aw):
+        """Await one network operation, giving up after self.timeout seconds."""
+        try:
+            return await asyncio.wait_for(aw, self.timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"No response from {self.host}:{self.port} in {self.timeout}s") from None
+    
+    async def _reply(self) -> Tuple[int, bytes]:
+        return await self._wait(self._read_reply())
+    
+    async def _drain(self):
+        await self._wait(self._writer.drain())
+    
+    async def _read_reply(self) -> Tuple[int, bytes]:
+        """Read one (possibly multi-line) reply."""
+        lines = []
+        while True:
+            try:
+                line = await self._reader.readuntil(b"\r\n")
+            except asyncio.IncompleteReadError:
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            lines.append(line[4:].rstrip())
+            if line[3:4] != b"-":
+                return int(line[:3]), b"\n".join(lines)
+    
+    async def _command(self, *commands: str) -> List[Tuple[int, bytes]]:
+        """Send commands, pipelined if the server allows it, and return their replies in order."""
+        if not self._pipelining:
+            replies = []
+            for command in commands:
+                self._writer.write(f"{command}\r\n".encode())
+                await self._drain()
+                replies.append(await self._reply())
+            return replies
+        self._writer.write("".join(f"{command}\r\n" for command in commands).encode())
+        await self._drain()
+        return [await self._reply() for _ in commands]
+    
+    async def _connect(self):
+        self._reader, self._writer = await self._wait(asyncio.open_connection(
+            self.host, self.port, ssl=ssl.create_default_context()))
+        try:
+            code, resp = await self._reply()
+            if code != 220:
+                raise smtplib.SMTPConnectError(code, resp)
+            [(code, resp)] = await self._command(f"EHLO {_local_hostname()}")
+            if code != 250:
+                raise smtplib.SMTPHeloError(code, resp)
+            self._pipelining = any(line.upper().startswith(b"PIPELINING") for line in resp.split(b"\n"))
+            token = base64.b64encode(f"\0{self.from_email}\0{self.app_password}".encode()).decode()
+            [(code, resp)] = await self._command(f"AUTH PLAIN {token}")
+            if code != 235:
+                raise smtplib.SMTPAuthenticationError(code, resp)
+        except BaseException:
+            self._drop()
+            raise
+    
+    async def _alive(self) -> bool:
+        if time.monotonic() - self._last_used < NOOP_AFTER:
+            return True
+        try:
+            return (await self._command("NOOP"))[0][0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+    
+    async def _transaction(self, from_addr: str, to_addrs: List[str], msg: str) -> Dict:
+        """Same protocol and errors as PipeliningSMTP.sendmail."""
+        replies = await self._command(
+            f"MAIL FROM:{smtplib.quoteaddr(from_addr)}",
+            *[f"RCPT TO:{smtplib.quoteaddr(addr)}" for addr in to_addrs],
+            "DATA"
+        )
+        mail_reply, data_reply = replies[0], replies[-1]
+        refused = {addr: reply for addr, reply in zip(to_addrs, replies[1:-1]) if reply[0] not in (250, 251)}
+        
+        error = None
+        if mail_reply[0] != 250:
+            error = smtplib.SMTPSenderRefused(mail_reply[0], mail_reply[1], from_addr)
+        elif len(refused) == len(to_addrs):
+            error = smtplib.SMTPRecipientsRefused(refused)
+        elif data_reply[0] != 354:
+            error = smtplib.SMTPDataError(*data_reply)
+        if error is not None:
+            if data_reply[0] == 354:
+                # The server is waiting for a message; end it empty before resetting
+                self._writer.write(b"." + smtplib.bCRLF)
+                await self._reply()
+            await self._command("RSET")
+            raise error
+        
+        self._writer.write(_dot_data(smtplib._fix_eols(msg).encode("ascii")))
+        await self._drain()
+        code, resp = await self._reply()
+        if code != 250:
+            await self._command("RSET")
+            raise smtplib.SMTPDataError(code, resp)
+        return refused
+    
+    @retry_transient
+    async def sendmail(self, from_addr: str, to_addrs: List[str], msg: str) -> Dict:
+        async with self._lock:
+            if self._writer is not None and not await self._alive():
+                await self._quit()
+            if self._writer is None:
+                await self._connect()
+            try:
+                result = await self._transaction(from_addr, to_addrs, msg)
+            except (smtplib.SMTPServerDisconnected, OSError):
+                # Drop the connection first so the retry reconnects
+                self._drop()
+                raise
+            self._last_used = time.monotonic()
+            return result
+    
+    def _drop(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+    
+    async def _quit(self):
+        try:
+            await self._command("QUIT")
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._drop()
+    
+    async def close(self):
+        async with self._lock:
+            if self._writer is not None:
+                await self._quit()
+
+# Sessions reused across send_email calls, keyed by (host, from_email)
+_smtp_pool: Dict[Tuple[str, str], SMTPSession] = {}
+_smtp_pool_lock = threading.Lock()
+
+def _get_smtp(from_email: str, app_password: str) -> SMTPSession:
+    """Return the pooled session for from_email, creating it on first use."""
+    key = (SMTP_SERVER, from_email)
+    with _smtp_pool_lock:
+        session = _smtp_pool.get(key)
+        if session is None:
+            session = _smtp_pool[key] = SMTPSession(from_email, app_password)
+        return session
+
+# Background senders, each holding one of the sender's SMTP connections
+# while it sends, so a burst of emails goes out over several connections
+SMTP_WORKERS = 4
+
+# Per (host, from_email) stack of SMTP_WORKERS sessions checked out by the
+# workers; LIFO keeps reusing warm connections when traffic is light
+_session_stacks: Dict[Tuple[str, str], "queue.LifoQueue[SMTPSession]"] = {}
+
+# send_email jobs handed to the background workers
+_MAIL_Q: "queue.Queue[Tuple[Dict, Future]]" = queue.Queue()
+_workers: List[threading.Thread] = []
+_worker_lock = threading.Lock()
+
+def _session_stack(from_email: str, app_password: str) -> "queue.LifoQueue[SMTPSession]":
+    key = (SMTP_SERVER, from_email)
+    with _smtp_pool_lock:
+        stack = _session_stacks.get(key)
+        if stack is None:
+            stack = _session_stacks[key] = queue.LifoQueue()
+            for _ in range(SMTP_WORKERS):
+                stack.put(SMTPSession(from_email, app_password))
+        return stack
+
+def _send_checked_out(kwargs: Dict) -> Dict:
+    """Run send_email over a session taken from the sender's stack, then return it."""
+    if kwargs.get("smtp") is not None:
+        return send_email(**kwargs)
+    stack = _session_stack(kwargs["from_email"], kwargs["app_password"])
+    session = stack.get()
+    try:
+        return send_email(**{**kwargs, "smtp": session})
+    finally:
+        stack.put(session)
+
+def _mail_worker():
+    while True:
+        kwargs, future = _MAIL_Q.get()
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(_send_checked_out(kwargs))
+                except Exception as e:
+                    future.set_exception(e)
+        finally:
+            _MAIL_Q.task_done()
+
+def enqueue_email(**kwargs) -> Future:
+    """
+    Queue a send_email call (same keyword arguments) and return at once.
+    
+    SMTP_WORKERS background threads take emails off the queue in order and
+    send them concurrently, each over its own connection for the sender,
+    so later emails may finish first. The returned Future resolves to
+    send_email's result or raises its exception.
+    """
+    with _worker_lock:
+        while len(_workers) < SMTP_WORKERS:
+            worker = threading.Thread(target=_mail_worker, name=f"send-email-{len(_workers)}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+    future = Future()
+    _MAIL_Q.put((kwargs, future))
+    return future
+
+def send_email_bulk(messages: List[Dict]) -> List[Dict]:
+    """
+    Send many emails at once over up to SMTP_WORKERS connections per sender.
+    
+    Args:
+        messages: List of send_email keyword-argument dicts
+    
+    Returns:
+        send_email's result for each message, in the same order.
+        If any message fails, the first failure is raised once it is
+        reached; the other messages are still sent.
+    """
+    futures = [enqueue_email(**kwargs) for kwargs in messages]
+    return [future.result() for future in futures]
+
+def close_all():
+    """Wait for queued emails, then QUIT every pooled SMTP connection; call on shutdown."""
+    if _workers:
+        _MAIL_Q.join()
+    with _smtp_pool_lock:
+        sessions = list(_smtp_pool.values())
+        _smtp_pool.clear()
+        for stack in _session_stacks.values():
+            sessions.extend(stack.queue)
+        _session_stacks.clear()
+    for session in sessions:
+        session.close()
+
+def _normalize_recipients(to_emails: Union[str, List[str]]) -> Tuple[List[str], List[str]]:
+    """
+    Return (header entries, envelope addresses) for the recipients.
+    
+    Entries may be bare addresses or "Name <addr>"; the envelope gets each
+    bare address once, compared case-insensitively.
+    """
+    if isinstance(to_emails, str):
+        to_emails = [to_emails]
+    header, envelope, seen = [], [], set()
+    for entry in to_emails:
+        for name, addr in getaddresses([entry]):
+            addr = addr.strip()
+            if not addr or addr.lower() in seen:
+                continue
+            seen.add(addr.lower())
+            header.append(formataddr((name, addr)))
+            envelope.append(addr)
+    return header, envelope
+
+# Plain-ASCII messages are filled into this template instead of going
+# through MIMEText and the email generator
+_MESSAGE_TEMPLATE = (
+    "From: {sender}\r\n"
+    "To: {to}\r\n"
+    "Subject: {subject}\r\n"
+    "Date: {date}\r\n"
+    "Message-ID: {message_id}\r\n"
+    "{thread_headers}"
+    "MIME-Version: 1.0\r\n"
+    "Content-Type: text/plain; charset=\"us-ascii\"\r\n"
+    "Content-Transfer-Encoding: 7bit\r\n"
+    "\r\n"
+    "{body}"
+)
+# SMTP line limit is 998 octets (RFC 5321); leave room for the header name
+MAX_LINE = 998
+MAX_HEADER_VALUE = 960
+
+def _is_plain(value: str, limit: int) -> bool:
+    return value.isascii() and "\r" not in value and "\n" not in value and len(value) <= limit
+
+def _render_message(sender: str, to_header: List[str], subject: str, body: str,
+                    date: str, message_id: str, thread_headers: Dict[str, str]) -> str:
+    """
+    Serialize a plain-text email. ASCII messages with short lines are
+    filled into _MESSAGE_TEMPLATE; anything that needs RFC 2047 headers,
+    a transfer encoding or folding goes through MIMEText.
+    """
+    lines = body.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    headers = [sender, subject, *to_header, *thread_headers.values()]
+    if (all(_is_plain(v, MAX_HEADER_VALUE) for v in headers)
+            and body.isascii() and all(len(line) <= MAX_LINE for line in lines)):
+        return _MESSAGE_TEMPLATE.format(
+            sender=sender,
+            # One recipient per folded line keeps long lists under the limit
+            to=",\r\n ".join(to_header),
+            subject=subject,
+            date=date,
+            message_id=message_id,
+            thread_headers="".join(f"{name}: {value}\r\n" for name, value in thread_headers.items()),
+            body="\r\n".join(lines)
+        )
+    
+    msg = MIMEText(body, "plain", "utf-8")
+    msg["Subject"] = subject
+    msg["From"] = sender
+    msg["To"] = ", ".join(to_header)
+    msg["Date"] = date
+    msg["Message-ID"] = message_id
+    for name, value in thread_headers.items():
+        msg[name] = value
+    return msg.as_string()
 
 def send_email(
     subject: str,
@@ -11,12 +489,148 @@ def send_email(
     app_password: str,
     from_name: str = "AI Meeting Scheduler",
     in_reply_to: str = None,
-    references: str = None
+    references: str = None,
+    bcc_emails: Union[str, List[str]] = None,
+    smtp: SMTPSession = None
 ) -> Dict:
     """
     Send a plain-text email via Gmail with optional threading headers (In-Reply-To, References).
     
     If 'in_reply_to' is provided, 'Re:' is prepended to 'subject'
     unless it already begins with "Re:".
+    
+    Sends over the pooled connection for 'from_email', which stays logged
+    in between calls (see close_all), unless an SMTPSession is passed as 'smtp'.
+    
+    All recipients get the same message in one SMTP transaction (one DATA,
+    one RCPT TO each). 'to_emails' are listed in To:, since they are the
+    meeting's attendees and should see each other; 'bcc_emails' only go in
+    the envelope, so they stay hidden as they were on the original email.
+    
+    Returns:
+        Dict with the sent message's 'message_id', 'subject', and 'to' and
+        'bcc' lists
+    """
+    recipients, raw, result = _build_email(subject, body, to_emails, from_email,
+                                           from_name, in_reply_to, references, bcc_emails)
+    session = smtp or _get_smtp(from_email, app_password)
+    session.sendmail(from_email, recipients, raw)
+    return result
+
+@functools.lru_cache(maxsize=None)
+def _local_hostname() -> str:
+    # getfqdn() can do a DNS lookup; resolve it once per process
+    return socket.getfqdn()
+
+# Message-ID counter, seeded from the clock so ids stay unique across restarts
+_msgid_counter = itertools.count(time.time_ns() // 1000)
+# (second, formatted Date header) of the last message
+_date_cache = (0, "")
+
+def _make_msgid() -> str:
+    """Unique Message-ID like email.utils.make_msgid, without its per-call getfqdn() and random draw."""
+    return f"<{next(_msgid_counter):x}.{os.getpid():x}@{_local_hostname()}>"
+
+def _date_header() -> str:
+    """Date header for now, formatted at most once per second."""
+    global _date_cache
+    now = int(time.time())
+    if _date_cache[0] != now:
+        _date_cache = (now, formatdate(now, localtime=True))
+    return _date_cache[1]
+
+def _build_email(subject, body, to_emails, from_email, from_name,
+                 in_reply_to, references, bcc_emails=None) -> Tuple[List[str], str, Dict]:
+    """Return (envelope recipients, serialized message, send_email's result) for a send."""
+    to_header, to_addrs = _normalize_recipients(to_emails)
+    # Bcc recipients go in the envelope only, never in a header
+    _, bcc_addrs = _normalize_recipients(bcc_emails or [])
+    visible = {addr.lower() for addr in to_addrs}
+    bcc_addrs = [addr for addr in bcc_addrs if addr.lower() not in visible]
+    recipients = to_addrs + bcc_addrs
+    if not recipients:
+        raise ValueError("send_email needs at least one recipient")
+    if in_reply_to and not subject.lower().startswith("re:"):
+        subject = f"Re: {subject}"
+    
+    thread_headers = {}
+    if in_reply_to:
+        refs = references.split() if isinstance(references, str) else list(references or [])
+        if in_reply_to not in refs:
+            refs.append(in_reply_to)
+        thread_headers = {"In-Reply-To": in_reply_to, "References": " ".join(refs)}
+    
+    message_id = _make_msgid()
+    raw = _render_message(formataddr((from_name, from_email)), to_header or ["undisclosed-recipients:;"],
+                          subject, body, _date_header(), message_id, thread_headers)
+    return recipients, raw, {"message_id": message_id, "subject": subject, "to": to_addrs, "bcc": bcc_addrs}
+
+# Per event loop: (host, from_email) -> stack of SMTP_WORKERS AsyncSMTPSessions,
+# since asyncio streams cannot outlive the loop that opened them
+_async_stacks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict]" = weakref.WeakKeyDictionary()
+
+def _async_session_stack(from_email: str, app_password: str) -> asyncio.LifoQueue:
+    stacks = _async_stacks.setdefault(asyncio.get_running_loop(), {})
+    key = (SMTP_SERVER, from_email)
+    stack = stacks.get(key)
+    if stack is None:
+        stack = stacks[key] = asyncio.LifoQueue()
+        for _ in range(SMTP_WORKERS):
+            stack.put_nowait(AsyncSMTPSession(from_email, app_password))
+    return stack
+
+async def send_email_async(
+    subject: str,
+    body: str,
+    to_emails: Union[str, List[str]],
+    from_email: str,
+    app_password: str,
+    from_name: str = "AI Meeting Scheduler",
+    in_reply_to: str = None,
+    references: str = None,
+    bcc_emails: Union[str, List[str]] = None,
+    smtp: AsyncSMTPSession = None
+) -> Dict:
     """
-    pass
\ No newline at end of file
+    Async version of send_email, for code running on an event loop.
+    
+    Same arguments, message and result as send_email, but sent over
+    AsyncSMTPSession instead of smtplib. Up to SMTP_WORKERS sends per
+    sender run at once, each over its own connection, which stays logged
+    in between calls (see close_all_async) unless 'smtp' is given.
+    """
+    recipients, raw, result = _build_email(subject, body, to_emails, from_email,
+                                           from_name, in_reply_to, references, bcc_emails)
+    if smtp is not None:
+        await smtp.sendmail(from_email, recipients, raw)
+        return result
+    stack = _async_session_stack(from_email, app_password)
+    session = await stack.get()
+    try:
+        await session.sendmail(from_email, recipients, raw)
+    finally:
+        stack.put_nowait(session)
+    return result
+
+async def close_all_async():
+    """QUIT every pooled AsyncSMTPSession of the running event loop; call before the loop ends."""
+    stacks = _async_stacks.pop(asyncio.get_running_loop(), {})
+    for stack in stacks.values():
+        while not stack.empty():
+            await stack.get_nowait().close()
+
+def main():
+    """Send a test email to yourself (uses EMAIL_USERNAME / EMAIL_PASSWORD)."""
+    username = os.environ["EMAIL_USERNAME"]
+    result = send_email(
+        subject="Test from AI Meeting Scheduler",
+        body="This is a test email.",
+        to_emails=username,
+        from_email=username,
+        app_password=os.environ["EMAIL_PASSWORD"]
+    )
+    print(f"Sent: {result}")
+    close_all()
+
+if __name__ == "__main__":
+    main()